@@ -1,20 +1,221 @@
+import argparse
+from os.path import exists
 
-from folder_cleaner import clean_folder
-import sys
+import destination_names
+import file_deduper
+import folder_cleaner
+import run_profiler
+import unknown_types
 
-if __name__ == '__main__':
-    print(sys.argv)
-    if len(sys.argv) <= 1 or sys.argv[1].strip() == '':
-        directory = input('Enter the Directory Path to clean: ').strip()
+CONFIG_JSON_PATH = 'fileTypesConfig.json'
+USER_CONFIG_FILE = 'userFileTypesConfig.json'
+
+
+def parse_args():
+    """
+    Parses the command line arguments of the app
+    """
+    parser = argparse.ArgumentParser(
+        description='A Simple Python App to clean files in any Directory.')
+    parser.add_argument('directories', nargs='*', default=[],
+                        help='Path(s) of the directories to clean')
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help='Clean the files of the sub-directories too')
+    parser.add_argument('--max-depth', type=int, default=None,
+                        help='Maximum depth of the sub-directories to clean (with --recursive)')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='Number of threads to move the files with (default 1)')
+    parser.add_argument('-n', '--dry-run', action='store_true',
+                        help='Display the move plan without moving any file')
+    parser.add_argument('--plan-file', default=None,
+                        help='Serialize the move plan into this file (JSON Lines)')
+    parser.add_argument('--engine', choices=['sync', 'async'], default='sync',
+                        help='sync => plan & then move, async => scan, classify & move concurrently (default sync)')
+    parser.add_argument('--queue-size', type=int, default=1000,
+                        help='Size of the bounded queues of the async engine (default 1000)')
+    parser.add_argument('--each-child', action='store_true',
+                        help='Clean each child directory of the directories as an independent root')
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help='Number of processes to clean many roots with (default number of CPUs)')
+    parser.add_argument('--journal', default=None,
+                        help='Record the moves in this journal file, to resume/undo the cleaning later')
+    parser.add_argument('--resume', metavar='JOURNAL', default=None,
+                        help='Complete the pending moves of an interrupted cleaning from its journal')
+    parser.add_argument('--undo', metavar='JOURNAL', default=None,
+                        help='Revert the moves recorded in a journal')
+    parser.add_argument('--manifest', default=None,
+                        help='SQLite manifest of the scanned directories, to skip the unchanged directories next time')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep watching the directories & clean the files as they land (Ctrl+C to stop)')
+    parser.add_argument('--debounce', type=float, default=.2,
+                        help='Seconds to wait for more files after a file lands, with --watch (default .2)')
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help='Seconds between two scans, with --watch when inotify is not available (default 1.0)')
+    parser.add_argument('--target', default=None,
+                        help='Create the category folders in this directory (may be on another filesystem)')
+    parser.add_argument('--sniff', action='store_true',
+                        help='Detect the type of the files with no/unknown extension from their content')
+    parser.add_argument('--dedupe', choices=file_deduper.ACTIONS, default=None,
+                        help='Find the duplicate files & report/hardlink/move them into the Duplicates folder')
+    parser.add_argument('--on-collision', choices=destination_names.POLICIES, default=destination_names.POLICY_RENAME,
+                        help='What to do when the destination of a file exists already (default rename)')
+    parser.add_argument('--unknown', choices=unknown_types.POLICIES, default=unknown_types.POLICY_ASK,
+                        help='What to do with the files of an unknown type, ask => prompt, leave => leave in place, '
+                        'unsorted => move into Unsorted/<type>, defer => queue for --resolve-deferred, '
+                        'rule => move using --unknown-rules (default ask)')
+    parser.add_argument('--unknown-rules', default=None,
+                        help='JSON file of rules (file name pattern => relative path), with --unknown rule')
+    parser.add_argument('--defer-queue', default=unknown_types.DEFAULT_QUEUE_FILE,
+                        help=f'File to queue the deferred files into (default {unknown_types.DEFAULT_QUEUE_FILE})')
+    parser.add_argument('--resolve-deferred', action='store_true',
+                        help='Ask once for a path of each type of the deferred files & move them')
+    parser.add_argument('--metrics', default=None,
+                        help='Write the metrics of the cleaning into this file (Prometheus textfile if *.prom, else JSON)')
+    parser.add_argument('--profile', choices=run_profiler.PROFILES, default=None,
+                        help='Profile the run, cpu => cProfile, mem => tracemalloc')
+    parser.add_argument('--profile-output', default=run_profiler.DEFAULT_STATS_FILE,
+                        help=f'File to dump the cpu profile into (default {run_profiler.DEFAULT_STATS_FILE})')
+    parser.add_argument('--profile-top', type=int, default=20,
+                        help='Number of functions/allocation sites to display with --profile (default 20)')
+    args = parser.parse_args()
+    args.multi_root = (len(args.directories) > 1 or args.each_child) and not args.watch
+    if args.engine == 'async' and (args.dry_run or args.plan_file):
+        parser.error('--dry-run/--plan-file need the sync engine')
+    if args.multi_root and (args.engine == 'async' or args.dry_run or args.plan_file):
+        parser.error(
+            'many roots (or --each-child) can\'t be used with --engine async/--dry-run/--plan-file')
+    if (args.manifest or args.target) and (args.multi_root or args.engine == 'async' or args.watch):
+        parser.error('--manifest/--target need the sync engine & a single root')
+    if args.metrics and (args.multi_root or args.engine == 'async' or args.watch):
+        parser.error('--metrics needs the sync engine & a single root')
+    if args.sniff and (args.multi_root or args.engine == 'async'):
+        parser.error('--sniff needs the sync engine & a single root (or --watch)')
+    if args.dedupe and (args.multi_root or args.engine == 'async' or args.watch):
+        parser.error('--dedupe needs the sync engine & a single root')
+    if args.unknown == unknown_types.POLICY_RULE and not args.unknown_rules:
+        parser.error('--unknown rule needs --unknown-rules')
+    if args.journal and (args.multi_root or args.engine == 'async'):
+        parser.error('--journal needs the sync engine & a single root')
+    for journal in [args.undo, args.resume]:
+        if journal and not exists(journal):
+            parser.error(f'journal {journal} not found')
+    if args.watch and (args.dry_run or args.plan_file or args.manifest or args.journal):
+        parser.error(
+            '--watch can\'t be used with --dry-run/--plan-file/--manifest/--journal')
+    return args
+
+
+def run(args, directories):
+    """
+    Cleans the directories using the mode selected by the command line arguments
+
+    Other engines than the sync engine are imported lazily, to keep the startup fast (E.g. asyncio, multiprocessing)
+    """
+    unknown_policy = unknown_types.UnknownTypesPolicy(
+        args.unknown, args.unknown_rules, args.defer_queue)
+    if args.watch:
+        import folder_watcher
+        folder_watcher.watch_folders(
+            CONFIG_JSON_PATH,
+            USER_CONFIG_FILE,
+            directories,
+            debounce=args.debounce,
+            poll_interval=args.poll_interval,
+            workers=args.workers,
+            log=True,
+            sniff=args.sniff,
+            collision_policy=args.on_collision,
+            unknown_policy=unknown_policy
+        )
+    elif args.multi_root:
+        import multi_root_cleaner
+        multi_root_cleaner.clean_folders(
+            CONFIG_JSON_PATH,
+            USER_CONFIG_FILE,
+            multi_root_cleaner.get_roots(directories, args.each_child),
+            log=True,
+            recursive=args.recursive,
+            max_depth=args.max_depth,
+            processes=args.processes,
+            workers=args.workers,
+            collision_policy=args.on_collision,
+            unknown_policy=unknown_policy
+        )
+    elif args.engine == 'async':
+        import async_folder_cleaner
+        async_folder_cleaner.clean_folder(
+            CONFIG_JSON_PATH,
+            USER_CONFIG_FILE,
+            directories[0],
+            log=True,
+            recursive=args.recursive,
+            max_depth=args.max_depth,
+            workers=args.workers,
+            queue_size=args.queue_size,
+            collision_policy=args.on_collision,
+            unknown_policy=unknown_policy
+        )
     else:
-        directory = sys.argv[1].strip()
-
-    if directory:
-        clean_folder(
-            'fileTypesConfig.json',
-            'userFileTypesConfig.json',
-            directory,
-            log=True
+        folder_cleaner.clean_folder(
+            CONFIG_JSON_PATH,
+            USER_CONFIG_FILE,
+            directories[0],
+            log=True,
+            recursive=args.recursive,
+            max_depth=args.max_depth,
+            workers=args.workers,
+            dry_run=args.dry_run,
+            plan_file=args.plan_file,
+            journal_file=args.journal,
+            manifest_file=args.manifest,
+            target_root=args.target,
+            sniff=args.sniff,
+            dedupe=args.dedupe,
+            collision_policy=args.on_collision,
+            metrics_file=args.metrics,
+            unknown_policy=unknown_policy
         )
+
+
+def get_directories(args):
+    """
+    Returns the directories to clean from the command line arguments (or from the end-user, if not given)
+    """
+    directories = [directory.strip() for directory in args.directories
+                   if directory.strip() != '']
+    if not directories:
+        directory = input('Enter the Directory Path to clean: ').strip()
+        if directory:
+            directories = [directory]
+    return directories
+
+
+def main(args):
+    """
+    Runs the app for the command line arguments
+    """
+    if args.undo or args.resume:
+        import move_journal
+    if args.undo:
+        reverted = move_journal.undo_moves(args.undo, log=True)
+        print(f"{len(reverted)} file(s) moved back")
+    elif args.resume:
+        pending = move_journal.resume_moves(
+            args.resume, args.workers, log=True, collision_policy=args.on_collision)
+        print(f"{len(pending)} pending file(s) moved")
+    elif args.resolve_deferred:
+        moved = unknown_types.resolve_deferred(
+            args.defer_queue, USER_CONFIG_FILE, args.workers, args.on_collision)
+        print(f"{len(moved)} deferred file(s) moved")
     else:
-        print('Enter a Valid Directory Name!')
+        directories = get_directories(args)
+        if directories:
+            run(args, directories)
+        else:
+            print('Enter a Valid Directory Name!')
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    run_profiler.run_profiled(args.profile, lambda: main(args),
+                              args.profile_output, args.profile_top)
@@ -0,0 +1,229 @@
+"""
+A Module which contains an asyncio based engine to clean a folder
+
+Scanning, classifying and moving of the files run as concurrent stages connected by bounded queues,
+so the files are moved while the directory tree is still being scanned and the memory is bounded by
+the size of the queues (and not by the number of files in the folder).
+Blocking filesystem calls are offloaded to a thread pool.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import threading
+from os.path import dirname, exists
+
+import classification_cache
+import destination_names
+import folder_cleaner
+import folder_cleaner_constants as fcc
+import utils
+
+# Marks the end of a queue
+END_OF_QUEUE = None
+
+
+def scan_files(loop, file_queue, get_files, stop_event):
+    """
+    Puts all the files into the file_queue (runs in a thread)
+
+    Blocks the scanning thread whenever the file_queue is full.
+
+    Parameters:
+    ---
+    loop: AbstractEventLoop
+        Event loop which owns the file_queue
+    file_queue: asyncio.Queue
+        Bounded queue to put the files into
+    get_files: callable
+        Function that returns the files of the folder to be cleaned (see folder_cleaner.get_files_to_clean)
+    stop_event: threading.Event
+        Event to stop scanning (set when any other stage fails)
+    """
+    try:
+        for file in get_files():
+            if stop_event.is_set():
+                return
+            asyncio.run_coroutine_threadsafe(
+                file_queue.put(file), loop).result()
+    finally:
+        asyncio.run_coroutine_threadsafe(
+            file_queue.put(END_OF_QUEUE), loop).result()
+
+
+async def classify_files(table: dict, folder_to_clean, file_queue, move_queue, movers, exceptional_files: dict):
+    """
+    Classifies the files of the file_queue and puts the planned moves into the move_queue
+
+    Parameters:
+    ---
+    table: dict
+        Classification table (see classification_cache.load_classification_table)
+    folder_to_clean: str
+        Path of folder to be cleaned
+    file_queue: asyncio.Queue
+        Queue of the files to be classified
+    move_queue: asyncio.Queue
+        Bounded queue to put the planned moves (folder_cleaner.Move) into
+    movers: int
+        Number of move_files tasks consuming the move_queue
+    exceptional_files: dict
+        Dictionary to store the files with an unknown file type (file_type => files)
+    """
+    while True:
+        file = await file_queue.get()
+        if file is END_OF_QUEUE:
+            break
+        plan, unknown_files = folder_cleaner.plan_file_moves(
+            table, [file], folder_to_clean)
+        for ext, files in unknown_files.items():
+            for unknown_file in files:
+                folder_cleaner.map_file_to_file_type(
+                    exceptional_files, ext, unknown_file)
+        for move in plan:
+            await move_queue.put(move)
+
+    for _ in range(movers):
+        await move_queue.put(END_OF_QUEUE)
+
+
+async def move_files(loop, executor, move_queue, created_dirs: set, names):
+    """
+    Moves the files of the move_queue using the executor
+
+    The destination of each move is reserved right before the move, so concurrent movers never pick the same destination.
+
+    Parameters:
+    ---
+    loop: AbstractEventLoop
+        Event loop which owns the move_queue
+    executor: Executor
+        Executor to run the blocking filesystem calls
+    move_queue: asyncio.Queue
+        Queue of the planned moves (folder_cleaner.Move)
+    created_dirs: set
+        Target directories which are already created (shared by all the move_files tasks)
+    names: DestinationNames
+        Names of the destination directories (shared by all the move_files tasks)
+    """
+    while True:
+        move = await move_queue.get()
+        if move is END_OF_QUEUE:
+            break
+        destination = await loop.run_in_executor(executor, names.reserve, move.source, move.destination)
+        # Colliding files are left in place (see destination_names)
+        if destination is None:
+            print(f"[SKIPPED - collision] {move.source} => {move.destination}")
+            continue
+        new_dir = dirname(destination)
+        if new_dir not in created_dirs:
+            await loop.run_in_executor(executor, folder_cleaner.create_directory, new_dir)
+            created_dirs.add(new_dir)
+        await loop.run_in_executor(executor, folder_cleaner.move_file, move.source, destination)
+
+
+async def clean_folder_pipeline(table: dict, folder_to_clean, recursive=False, max_depth=None, workers=4,
+                                queue_size=1000, collision_policy=destination_names.POLICY_RENAME):
+    """
+    Cleans a folder through the scan => classify => move pipeline and Returns the exceptional files (file_type => files)
+
+    Parameters:
+    ---
+    table: dict
+        Classification table (see classification_cache.load_classification_table)
+    folder_to_clean: str
+        Path of folder to be cleaned
+    recursive: bool
+        Clean the files of the sub-directories too (default False)
+    max_depth: int
+        Maximum depth of the sub-directories to clean, when recursive is True.  None for no limit (default None)
+    workers: int
+        Number of concurrent moves (default 4)
+    queue_size: int
+        Maximum number of files/moves waiting in each queue (default 1000)
+    collision_policy: str
+        What to do when the destination of a file exists already, one of destination_names.POLICIES (default rename)
+    """
+    loop = asyncio.get_running_loop()
+    workers = max(workers, 1)
+    file_queue = asyncio.Queue(maxsize=queue_size)
+    move_queue = asyncio.Queue(maxsize=queue_size)
+    exceptional_files = {}
+    created_dirs = set()
+    names = destination_names.DestinationNames(collision_policy)
+    stop_event = threading.Event()
+
+    # One extra thread for the scanner, so that it never starves the movers
+    with ThreadPoolExecutor(max_workers=workers + 1) as executor:
+        get_files = partial(folder_cleaner.get_files_to_clean,
+                            folder_to_clean, recursive, max_depth, table['category_dirs'])
+        scanner = loop.run_in_executor(
+            executor, scan_files, loop, file_queue, get_files, stop_event)
+        try:
+            await asyncio.gather(
+                classify_files(table, folder_to_clean, file_queue,
+                               move_queue, workers, exceptional_files),
+                *[move_files(loop, executor, move_queue, created_dirs, names)
+                  for _ in range(workers)]
+            )
+        except BaseException:
+            # Unblocking the scanner (if it waits for a free slot in the file_queue), so that it can stop
+            stop_event.set()
+            while not scanner.done():
+                while not file_queue.empty():
+                    file_queue.get_nowait()
+                await asyncio.sleep(.01)
+            raise
+        await scanner
+    return exceptional_files
+
+
+def clean_folder(config_json_path, user_config_file, folder_to_clean, log=False, recursive=False, max_depth=None,
+                 workers=4, queue_size=1000, collision_policy=destination_names.POLICY_RENAME, unknown_policy=None):
+    """
+    Performs Folder Cleaning Operation using the asyncio pipeline (see folder_cleaner.clean_folder)
+
+    Parameters:
+    ---
+    config_json_path: str
+        Path of the JSON File that contains the details of all the possible file types.
+    user_config_file: str
+        Path of the user_config JSON file
+    folder_to_clean: str
+        Path of folder to be cleaned
+    log: bool
+        Diplay Spinner with the corresponding log message when doing the corresponding operation (default False)
+    recursive: bool
+        Clean the files of the sub-directories too (default False)
+    max_depth: int
+        Maximum depth of the sub-directories to clean, when recursive is True.  None for no limit (default None)
+    workers: int
+        Number of concurrent moves (default 4)
+    queue_size: int
+        Maximum number of files/moves waiting in each queue (default 1000)
+    collision_policy: str
+        What to do when the destination of a file exists already, one of destination_names.POLICIES (default rename)
+    unknown_policy: unknown_types.UnknownTypesPolicy
+        What to do with the files with an unknown file type, without asking the end-user.
+        None to ask the end-user (default None)
+    """
+    # Loading the User Config FileTypes JSON Data
+    if not exists(user_config_file):
+        utils.create_file(user_config_file, '{}')
+
+    # Loading the compiled classification table of the APP Generated FileTypes & User Config FileTypes
+    table = classification_cache.load_classification_table(
+        config_json_path, user_config_file)
+
+    # Starting Directory Scanning & Folder Cleaner Spinner
+    spnr = utils.start_spinner(log, msg=fcc.MSG_SCAN)
+
+    exceptional_files = asyncio.run(clean_folder_pipeline(
+        table, folder_to_clean, recursive, max_depth, workers, queue_size, collision_policy))
+
+    # Stopping Directory Scanning & Folder Cleaner Spinner
+    utils.stop_spinner(spnr, msg=fcc.MSG_SCANNED)
+
+    folder_cleaner.move_exceptional_files(
+        exceptional_files, user_config_file, folder_to_clean, log, workers, collision_policy=collision_policy,
+        unknown_policy=unknown_policy)
@@ -0,0 +1,368 @@
+"""
+A Benchmark of the folder cleaning engines on reproducible synthetic directory trees
+
+A tree is generated from a seed (number of files, depth, sizes & file types drawn from the known file types of the config),
+cleaned by each engine and the results are reported as JSON, so the numbers of two releases can be compared.
+
+The multi engine cleans each sub-directory of the tree as a root, so when it is benchmarked, the files of the tree are
+generated in the sub-directories only (for every engine, so that all of them clean the same files).
+The per-phase times & file counters of an engine (engine_stats) are reported for the sync engine only: the phases of
+the async pipeline overlap & the multi engine records them in its worker processes (see ENGINES_WITH_STATS).
+
+Filesystem calls are counted using audit hooks (Python 3.8+, in-process only, so the worker processes of the multi
+engine are not counted) along with the read/write system calls of /proc/self/io (Linux).
+
+With --startup, the cold start of app.py (on a directory with nothing to clean) is measured instead, along with the
+import time of each top-level module (python -X importtime), to catch the startup regressions.
+"""
+
+import argparse
+from contextlib import redirect_stdout
+import json
+import os
+from os.path import exists, join
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import async_folder_cleaner
+import classification_cache
+import folder_cleaner
+import multi_root_cleaner
+import utils
+
+ENGINES = ['sync', 'async', 'multi']
+# Engines which return their metrics (CleanStats)
+ENGINES_WITH_STATS = ['sync']
+
+# Characters which are not allowed in a file name (Windows)
+INVALID_NAME_CHARS = set('<>:"/\\|?*')
+
+# Audit events of the filesystem calls that are counted
+AUDITED_EVENTS = {'open', 'os.scandir', 'os.listdir', 'os.rename', 'os.replace', 'os.mkdir', 'os.remove',
+                  'os.link', 'os.rmdir', 'shutil.copyfile', 'shutil.copystat'}
+
+
+class SyscallCounter():
+    """
+        Counts the filesystem calls of this process while it is active
+    """
+
+    def __init__(self):
+        self.active = False
+        self.counts = {}
+        if hasattr(sys, 'addaudithook'):
+            sys.addaudithook(self.__hook)
+
+    def __hook(self, event, args):
+        if self.active and event in AUDITED_EVENTS:
+            self.counts[event] = self.counts.get(event, 0) + 1
+
+    def start(self):
+        """
+        Resets the counts and starts counting
+        """
+        self.counts = {}
+        self.__io = read_proc_io()
+        self.active = True
+
+    def stop(self):
+        """
+        Stops counting and Returns the counts (event => count), along with the read/write system calls (if available)
+        """
+        self.active = False
+        counts = dict(self.counts)
+        io = read_proc_io()
+        if io and self.__io:
+            counts['syscr'] = io['syscr'] - self.__io['syscr']
+            counts['syscw'] = io['syscw'] - self.__io['syscw']
+        return counts
+
+
+def read_proc_io():
+    """
+    Returns the I/O counters of this process (/proc/self/io), None if not available
+    """
+    try:
+        with open('/proc/self/io') as fp:
+            return {key: int(value) for key, value in (line.split(':') for line in fp)}
+    except (OSError, ValueError):
+        return None
+
+
+def get_known_file_types(config_json_path):
+    """
+    Returns the sorted list of the file types known to the config (which are valid in a file name on every platform)
+
+    Parameters:
+    ---
+    config_json_path: str
+        Path of the JSON File that contains the details of all the possible file types.
+    """
+    file_type_index = folder_cleaner.build_file_type_index(
+        utils.load_json(config_json_path))
+    return sorted(file_type for file_type in file_type_index
+                  if file_type and not file_type.startswith('.') and not INVALID_NAME_CHARS.intersection(file_type))
+
+
+def generate_tree(root, file_types, files=1000, depth=2, dirs_per_level=4, min_size=0, max_size=4096, seed=0,
+                  root_files=True):
+    """
+    Generates a synthetic directory tree (same seed => same tree) and Returns the list of the generated files
+
+    Parameters:
+    ---
+    root: str
+        Path of the folder to generate the tree in (created if not exists)
+    file_types: list
+        File types to draw the extension of each file from
+    files: int
+        Number of files (default 1000)
+    depth: int
+        Number of levels of the sub-directories (default 2)
+    dirs_per_level: int
+        Number of sub-directories of each directory (default 4)
+    min_size: int
+        Minimum size of a file in bytes (default 0)
+    max_size: int
+        Maximum size of a file in bytes (default 4096)
+    seed: int
+        Seed of the random generator (default 0)
+    root_files: bool
+        Generate files in the root itself too, else in its sub-directories only (default True)
+    """
+    rng = random.Random(seed)
+    directories = [root]
+    level = [root]
+    for _ in range(depth):
+        level = [join(directory, f"dir{index}") for directory in level
+                 for index in range(dirs_per_level)]
+        directories.extend(level)
+    for directory in directories:
+        os.makedirs(directory, exist_ok=True)
+
+    file_dirs = directories if root_files else directories[1:]
+    generated = []
+    for index in range(files):
+        file_path = join(rng.choice(file_dirs),
+                         f"file{index:07d}.{rng.choice(file_types)}")
+        size = rng.randint(min_size, max_size)
+        with open(file_path, 'wb') as fp:
+            fp.write(rng.getrandbits(size * 8).to_bytes(size, 'little'))
+        generated.append(file_path)
+    return generated
+
+
+def run_engine(engine, config_json_path, user_config_file, root, workers=1):
+    """
+    Cleans a root (recursively) using an engine and Returns the metrics of the engine (CleanStats),
+    None if not available (see ENGINES_WITH_STATS)
+
+    The multi engine cleans each sub-directory of the root as a root (the files of the root itself are not cleaned)
+
+    Parameters:
+    ---
+    engine: str
+        One of ENGINES
+    config_json_path: str
+        Path of the JSON File that contains the details of all the possible file types.
+    user_config_file: str
+        Path of the user_config JSON file
+    root: str
+        Path of folder to be cleaned
+    workers: int
+        Number of threads to move the files with (default 1)
+    """
+    if engine == 'sync':
+        return folder_cleaner.clean_folder(
+            config_json_path, user_config_file, root, recursive=True, workers=workers)
+    elif engine == 'async':
+        async_folder_cleaner.clean_folder(
+            config_json_path, user_config_file, root, recursive=True, workers=workers)
+    else:
+        multi_root_cleaner.clean_folders(config_json_path, user_config_file,
+                                         multi_root_cleaner.get_roots([root], each_child=True),
+                                         recursive=True, workers=workers)
+
+
+def run_benchmark(args):
+    """
+    Runs the benchmark described by the command line arguments and Returns the report (dictionary)
+    """
+    file_types = args.extensions or get_known_file_types(args.config)
+    base_dir = args.root or tempfile.mkdtemp(
+        prefix='folder-cleaner-bench-', dir='/dev/shm' if args.tmpfs and exists('/dev/shm') else None)
+    user_config_file = join(base_dir, 'userFileTypesConfig.json')
+    utils.create_file(user_config_file, '{}')
+    counter = SyscallCounter()
+
+    # Warming up the classification cache, so that every run just reads it
+    start = time.perf_counter()
+    classification_cache.load_classification_table(
+        args.config, user_config_file)
+    load_time = time.perf_counter() - start
+
+    results = []
+    try:
+        for engine in args.engines:
+            for repeat in range(args.repeat):
+                root = join(base_dir, 'tree')
+                folder_cleaner.delete_directory(root)
+
+                start = time.perf_counter()
+                generated = generate_tree(root, file_types, args.files, args.depth, args.dirs_per_level,
+                                          args.min_size, args.max_size, args.seed, 'multi' not in args.engines)
+                generate_time = time.perf_counter() - start
+
+                counter.start()
+                start = time.perf_counter()
+                with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                    stats = run_engine(engine, args.config,
+                                       user_config_file, root, args.workers)
+                clean_time = time.perf_counter() - start
+                syscalls = counter.stop()
+
+                start = time.perf_counter()
+                moved = sum(1 for file in generated if not exists(file))
+                verify_time = time.perf_counter() - start
+
+                results.append({
+                    'engine': engine,
+                    'workers': args.workers,
+                    'repeat': repeat,
+                    'files': len(generated),
+                    'moved': moved,
+                    'files_per_sec': moved / clean_time if clean_time else None,
+                    'phases': {'generate': generate_time, 'clean': clean_time, 'verify': verify_time},
+                    'syscalls': syscalls,
+                    'engine_stats': stats.to_dict() if stats else None
+                })
+    finally:
+        if not args.root and not args.keep:
+            shutil.rmtree(base_dir, ignore_errors=True)
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'load_table': load_time,
+        'engines_with_stats': [engine for engine in args.engines if engine in ENGINES_WITH_STATS],
+        'parameters': {key: value for key, value in vars(args).items() if key != 'output'},
+        'results': results
+    }
+
+
+def parse_import_times(stderr):
+    """
+    Returns the cumulative import time (in ms) of each top-level module from the output of python -X importtime
+
+    Parameters:
+    ---
+    stderr: str
+        Standard error of a python -X importtime run
+    """
+    import_times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        # Top-level modules have no indentation
+        if not module.startswith('  '):
+            import_times[module.strip()] = int(cumulative) / 1000
+    return import_times
+
+
+def run_startup_benchmark(args):
+    """
+    Measures the cold start of app.py on an empty directory and Returns the report (dictionary)
+    """
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    # Running in a temporary folder, so that the user config created by the app is thrown away
+    work_dir = tempfile.mkdtemp(prefix='folder-cleaner-startup-')
+    empty_dir = join(work_dir, 'empty')
+    os.mkdir(empty_dir)
+    try:
+        wall_times = []
+        import_times = {}
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, join(app_dir, 'app.py'), empty_dir],
+                           cwd=work_dir, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, check=True)
+            wall_times.append((time.perf_counter() - start) * 1000)
+        result = subprocess.run([sys.executable, '-X', 'importtime', join(app_dir, 'app.py'), empty_dir],
+                                cwd=work_dir, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE, universal_newlines=True, check=True)
+        import_times = parse_import_times(result.stderr)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'startup_ms': {'min': min(wall_times), 'median': statistics.median(wall_times), 'max': max(wall_times)},
+        'import_ms': dict(sorted(import_times.items(), key=lambda item: -item[1])),
+        'max_startup_ms': args.max_startup_ms
+    }
+
+
+def parse_args():
+    """
+    Parses the command line arguments of the benchmark
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark of the folder cleaning engines on synthetic directory trees.')
+    parser.add_argument('--config', default='fileTypesConfig.json',
+                        help='JSON File of the file types (default fileTypesConfig.json)')
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=ENGINES,
+                        help='Engines to benchmark (default all)')
+    parser.add_argument('--files', type=int, default=1000,
+                        help='Number of files of the tree (default 1000)')
+    parser.add_argument('--depth', type=int, default=2,
+                        help='Number of levels of the sub-directories (default 2)')
+    parser.add_argument('--dirs-per-level', type=int, default=4,
+                        help='Number of sub-directories of each directory (default 4)')
+    parser.add_argument('--min-size', type=int, default=0,
+                        help='Minimum size of a file in bytes (default 0)')
+    parser.add_argument('--max-size', type=int, default=4096,
+                        help='Maximum size of a file in bytes (default 4096)')
+    parser.add_argument('--extensions', nargs='+', default=None,
+                        help='File types to draw from (default all the file types of the config)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the tree generator (default 0)')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='Number of threads to move the files with (default 1)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of runs of each engine (default 3)')
+    parser.add_argument('--root', default=None,
+                        help='Folder to generate the trees in (default a temporary folder, removed at the end)')
+    parser.add_argument('--tmpfs', action='store_true',
+                        help='Generate the trees on tmpfs (/dev/shm), when --root is not given')
+    parser.add_argument('--keep', action='store_true',
+                        help='Keep the temporary folder')
+    parser.add_argument('--startup', action='store_true',
+                        help='Measure the cold start of app.py on an empty directory instead')
+    parser.add_argument('--max-startup-ms', type=float, default=None,
+                        help='Exit with 1 if the median cold start of --startup is slower than this')
+    parser.add_argument('-o', '--output', default=None,
+                        help='Write the JSON report into this file (default stdout)')
+    args = parser.parse_args()
+    if 'multi' in args.engines and not args.startup and (args.depth < 1 or args.dirs_per_level < 1):
+        parser.error('the multi engine needs sub-directories (--depth & --dirs-per-level of at least 1)')
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    report = run_startup_benchmark(args) if args.startup else run_benchmark(args)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(report, fp, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
+    if args.startup and args.max_startup_ms and report['startup_ms']['median'] > args.max_startup_ms:
+        sys.exit(1)
@@ -0,0 +1,268 @@
+"""
+A Module to compile the file type configurations (fileTypesConfig.json & userFileTypesConfig.json) into a single
+classification table and to persist it on the disk.
+
+The compiled table is stored next to the fileTypesConfig.json (fileTypesConfig.json.cache) and it gets invalidated
+whenever the mtime/size (and the content hash) of any of its source JSON files changes.  The cache file is read
+through a read-only memory map, so that cron-driven runs and pool workers can start classifying without parsing JSON.
+"""
+
+import mmap
+import os
+import pickle
+
+import folder_cleaner
+import user_config_store
+import utils
+
+CACHE_VERSION = 5
+CACHE_EXTENSION = '.cache'
+
+
+def get_cache_path(config_json_path):
+    """
+    Returns the default path of the compiled classification table for a config_json_path
+
+    Parameters:
+    ---
+    config_json_path: str
+        Path of the JSON File that contains the details of all the possible file types
+    """
+    return config_json_path + CACHE_EXTENSION
+
+
+def get_file_hash(file_path):
+    """
+    Returns the SHA-1 hash of a file's content
+
+    Parameters:
+    ---
+    file_path: str
+        Path of the file to hash
+    """
+    import hashlib  # Imported lazily, just needed when the mtime of a source changes
+
+    with open(file_path, 'rb') as fp:
+        return hashlib.sha1(fp.read()).hexdigest()
+
+
+def get_source_signature(file_path, with_hash=True):
+    """
+    Returns a dictionary that identifies the current version of a source file (mtime, size & hash)
+
+    Parameters:
+    ---
+    file_path: str
+        Path of the source file
+    with_hash: bool
+        Flag to decide whether to hash the file content too (default True)
+    """
+    stat = os.stat(file_path)
+    return {
+        'mtime': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'hash': get_file_hash(file_path) if with_hash else None
+    }
+
+
+def is_signature_current(file_path, signature):
+    """
+    Returns True if the mtime & size of the source file are still the ones of the signature (no hashing needed)
+
+    Parameters:
+    ---
+    file_path: str
+        Path of the source file
+    signature: dict
+        Signature stored in the cache (returned by get_source_signature)
+    """
+    try:
+        current = get_source_signature(file_path, with_hash=False)
+    except OSError:
+        return False
+    return current['mtime'] == signature['mtime'] and current['size'] == signature['size']
+
+
+def get_unchanged_signature(file_path, signature):
+    """
+    Returns the current signature of the source file if it still matches the signature stored in the cache, else None
+
+    Compares the mtime & size first and hashes the content only when they differ
+    (E.g. a config file which is touched/rewritten without any change is still a valid source).
+    The mtime & size are taken before hashing, so an edit made meanwhile is detected by the next read.
+
+    Parameters:
+    ---
+    file_path: str
+        Path of the source file
+    signature: dict
+        Signature stored in the cache (returned by get_source_signature)
+    """
+    try:
+        current = get_source_signature(file_path, with_hash=False)
+        if current['size'] != signature['size']:
+            return None
+        if current['mtime'] != signature['mtime'] and get_file_hash(file_path) != signature['hash']:
+            return None
+    except OSError:
+        return None
+    current['hash'] = signature['hash']
+    return current
+
+
+def compile_classification_table(config_json_path, user_config_file):
+    """
+    Returns the classification table built from the config_json_path & user_config_file
+
+    The table is a dictionary with the following keys
+        file_type_index => file_type => list of paths (see folder_cleaner.build_file_type_index)
+        user_config => user configuration (file_type => relative path)
+        user_paths => file type (lower case) => relative path configured by the user
+        suffix_trie => trie of the compound file types (see folder_cleaner.build_suffix_trie)
+        category_dirs => names of the top-level category folders the cleaner may create
+
+    Parameters:
+    ---
+    config_json_path: str
+        Path of the JSON File that contains the details of all the possible file types.
+    user_config_file: str
+        Path of the user_config JSON file
+    """
+    store = user_config_store.UserConfigStore(user_config_file)
+    user_config = store.to_dict()
+    file_type_index = folder_cleaner.build_file_type_index(
+        utils.load_json(config_json_path))
+    user_paths = dict(store.paths)
+    return {
+        'file_type_index': file_type_index,
+        'user_config': user_config,
+        'user_paths': user_paths,
+        'suffix_trie': folder_cleaner.build_suffix_trie(set(file_type_index) | set(user_paths)),
+        'category_dirs': folder_cleaner.get_category_dirs(file_type_index, user_config)
+    }
+
+
+def read_classification_cache(cache_path, sources):
+    """
+    Returns the classification table stored in the cache_path, None if the cache is missing/invalid/outdated
+
+    If a source was touched/rewritten without any change (the hash still matches), the header is rewritten with the
+    current signatures, so that the next runs don't hash the sources again.
+
+    Parameters:
+    ---
+    cache_path: str
+        Path of the compiled classification table
+    sources: list
+        Paths of the source JSON files the table was built from
+    """
+    try:
+        with open(cache_path, 'rb') as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # The header (version & signatures of the sources) is pickled before the table,
+            # so an outdated table is never unpickled
+            header = pickle.load(mm)
+            if header.get('version') != CACHE_VERSION:
+                return None
+            signatures = header.get('sources', {})
+            if sorted(signatures.keys()) != sorted(sources):
+                return None
+            current = {}
+            for source in sources:
+                current[source] = get_unchanged_signature(
+                    source, signatures[source])
+                if current[source] is None:
+                    return None
+            table = pickle.load(mm)
+    except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+        return None
+
+    # Rewritten after the cache is closed (an open/mapped file can't be replaced on Windows)
+    if current != signatures:
+        write_classification_cache(cache_path, current, table)
+    return table
+
+
+def write_classification_cache(cache_path, signatures, table):
+    """
+    Writes the classification table to the cache_path
+
+    The table is written to a temporary file and renamed to the cache_path,
+    so that a concurrent reader never sees a partially written cache.
+
+    Parameters:
+    ---
+    cache_path: str
+        Path of the compiled classification table
+    signatures: dict
+        Path of each source JSON file the table was built from => its signature (see get_source_signature),
+        taken before the source was read
+    table: dict
+        Classification table (returned by compile_classification_table)
+    """
+    header = {
+        'version': CACHE_VERSION,
+        'sources': signatures
+    }
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as fp:
+            pickle.dump(header, fp, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(table, fp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        # Caching is just an optimization, a read-only directory shouldn't fail the cleaning
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def get_sources_signature(config_json_path, user_config_file, cache_path=None):
+    """
+    Returns a string that identifies the current content of the config_json_path & user_config_file
+    (taken from the header of the cache, when it is up-to-date, else by hashing the sources)
+
+    Parameters:
+    ---
+    config_json_path: str
+        Path of the JSON File that contains the details of all the possible file types.
+    user_config_file: str
+        Path of the user_config JSON file
+    cache_path: str
+        Path of the compiled classification table (default config_json_path + '.cache')
+    """
+    cache_path = cache_path or get_cache_path(config_json_path)
+    sources = [config_json_path, user_config_file]
+    try:
+        with open(cache_path, 'rb') as fp:
+            signatures = pickle.load(fp).get('sources', {})
+        if all(source in signatures and is_signature_current(source, signatures[source]) for source in sources):
+            return ':'.join(signatures[source]['hash'] for source in sources)
+    except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+        pass
+    return ':'.join(get_file_hash(source) for source in sources)
+
+
+def load_classification_table(config_json_path, user_config_file, cache_path=None):
+    """
+    Returns the classification table for the config_json_path & user_config_file
+
+    Uses the compiled table from the cache_path if it is up-to-date, else compiles the table and updates the cache.
+
+    Parameters:
+    ---
+    config_json_path: str
+        Path of the JSON File that contains the details of all the possible file types.
+    user_config_file: str
+        Path of the user_config JSON file
+    cache_path: str
+        Path of the compiled classification table (default config_json_path + '.cache')
+    """
+    cache_path = cache_path or get_cache_path(config_json_path)
+    sources = [config_json_path, user_config_file]
+
+    table = read_classification_cache(cache_path, sources)
+    if table is None:
+        # The signatures are taken before the sources are read, so an edit made meanwhile is detected by the next run
+        signatures = {source: get_source_signature(source) for source in sources}
+        table = compile_classification_table(config_json_path, user_config_file)
+        write_classification_cache(cache_path, signatures, table)
+    return table
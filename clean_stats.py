@@ -0,0 +1,188 @@
+"""
+A Module to collect the metrics of a cleaning (time of each phase & counters of the files)
+
+The metrics can be written as JSON or as a Prometheus textfile (for the textfile collector of node-exporter).
+"""
+
+from contextlib import contextmanager, nullcontext
+import json
+import os
+from os.path import basename, dirname, join
+import threading
+import time
+
+# Phases of a cleaning
+PHASE_CONFIG_LOAD = 'config_load'
+PHASE_SCAN = 'scan'
+PHASE_DEDUPE = 'dedupe'
+PHASE_CLASSIFY = 'classify'
+PHASE_CREATE_DIRS = 'create_dirs'
+PHASE_MOVE = 'move'
+
+# Prefix of the Prometheus metrics
+METRIC_PREFIX = 'folder_cleaner'
+
+
+def timer(stats, phase):
+    """
+    Returns a Context Manager that adds the time spent in its block to a phase of the stats (does nothing if stats is None)
+
+    Parameters:
+    ---
+    stats: CleanStats
+        Metrics to record the time in
+    phase: str
+        Name of the phase (one of the PHASE_* constants)
+    """
+    return stats.timer(phase) if stats is not None else nullcontext()
+
+
+class CleanStats():
+    """
+        Metrics of a cleaning (thread-safe)
+
+        The file counters are exclusive, a file is counted as moved, skipped (collision), unknown (left in place) or errored
+    """
+
+    def __init__(self, folder=None):
+        """
+        Parameters:
+        ---
+        folder: str
+            Path of the cleaned folder (default None)
+        """
+        self.folder = folder
+        # phase => seconds
+        self.phases = {}
+        self.files_moved = 0
+        self.files_skipped = 0
+        self.files_unknown = 0
+        self.files_errored = 0
+        self.bytes_moved = 0
+        self.started_at = time.time()
+        # Total time counted in all the phases so far, so that a phase timed inside another one is not counted twice
+        self.__timed = 0
+        self.__lock = threading.Lock()
+
+    def __add_time(self, phase, seconds):
+        """
+        Adds seconds to a phase
+        """
+        with self.__lock:
+            self.phases[phase] = self.phases.get(phase, 0) + seconds
+            self.__timed += seconds
+
+    @contextmanager
+    def timer(self, phase):
+        """
+        Context Manager that adds the time spent in its block to a phase (monotonic clock),
+        excluding the time of the phases timed inside the block (E.g. the scan of the files consumed while classifying)
+
+        Parameters:
+        ---
+        phase: str
+            Name of the phase (one of the PHASE_* constants)
+        """
+        start = time.perf_counter()
+        timed_before = self.__timed
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.__add_time(phase, elapsed - (self.__timed - timed_before))
+
+    def timed(self, phase, iterable):
+        """
+        Yields the items of an iterable (E.g. a generator walking a directory tree) and adds the time spent producing them to a phase
+
+        Parameters:
+        ---
+        phase: str
+            Name of the phase (one of the PHASE_* constants)
+        iterable: iterable
+            Items to yield
+        """
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.__add_time(phase, time.perf_counter() - start)
+                return
+            self.__add_time(phase, time.perf_counter() - start)
+            yield item
+
+    def add(self, **counters):
+        """
+        Increments the counters (E.g. add(files_moved=1, bytes_moved=1024))
+        """
+        with self.__lock:
+            for name, value in counters.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def to_dict(self):
+        """
+        Returns the metrics as a dictionary
+        """
+        with self.__lock:
+            return {
+                'folder': self.folder,
+                'started_at': self.started_at,
+                'phases': dict(self.phases),
+                'files_moved': self.files_moved,
+                'files_skipped': self.files_skipped,
+                'files_unknown': self.files_unknown,
+                'files_errored': self.files_errored,
+                'bytes_moved': self.bytes_moved
+            }
+
+    def to_prometheus(self):
+        """
+        Returns the metrics in the Prometheus text exposition format
+        """
+        stats = self.to_dict()
+        folder = (stats['folder'] or '').replace(
+            '\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        labels = f'folder="{folder}"'
+        lines = [
+            f"# HELP {METRIC_PREFIX}_phase_seconds Seconds spent in each phase of the last cleaning",
+            f"# TYPE {METRIC_PREFIX}_phase_seconds gauge"
+        ]
+        lines.extend(f'{METRIC_PREFIX}_phase_seconds{{{labels},phase="{phase}"}} {seconds}'
+                     for phase, seconds in sorted(stats['phases'].items()))
+        lines.extend([
+            f"# HELP {METRIC_PREFIX}_files Number of files of the last cleaning by result",
+            f"# TYPE {METRIC_PREFIX}_files gauge"
+        ])
+        lines.extend(f'{METRIC_PREFIX}_files{{{labels},result="{result}"}} {stats["files_" + result]}'
+                     for result in ['moved', 'skipped', 'unknown', 'errored'])
+        lines.extend([
+            f"# HELP {METRIC_PREFIX}_bytes_moved Number of bytes moved by the last cleaning",
+            f"# TYPE {METRIC_PREFIX}_bytes_moved gauge",
+            f"{METRIC_PREFIX}_bytes_moved{{{labels}}} {stats['bytes_moved']}",
+            f"# HELP {METRIC_PREFIX}_last_run_timestamp_seconds Start time of the last cleaning",
+            f"# TYPE {METRIC_PREFIX}_last_run_timestamp_seconds gauge",
+            f"{METRIC_PREFIX}_last_run_timestamp_seconds{{{labels}}} {stats['started_at']}"
+        ])
+        return '\n'.join(lines) + '\n'
+
+    def write(self, metrics_file):
+        """
+        Writes the metrics to a file atomically (a scraper never reads a partial file).
+        Prometheus textfile if the file name ends with .prom, else JSON
+
+        Parameters:
+        ---
+        metrics_file: str
+            Path of the metrics file
+        """
+        if metrics_file.endswith('.prom'):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.to_dict(), indent=4)
+        temp_path = join(dirname(metrics_file),
+                         f".{basename(metrics_file)}.{os.getpid()}.tmp")
+        with open(temp_path, 'w') as fp:
+            fp.write(content)
+        os.replace(temp_path, metrics_file)
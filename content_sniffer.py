@@ -0,0 +1,155 @@
+"""
+A Module to detect the type of a file from its content (magic bytes)
+
+Used to classify the files which have no extension or an unknown extension.  Just the first few KB of a file are read
+(a single read call) and the detected types are cached by (size, mtime, inode), so a rescan never reads a header again.
+"""
+
+import os
+
+# Number of bytes read from the beginning of a file
+HEADER_SIZE = 4096
+
+# (offset, magic bytes, file types) => file types are in the order of preference, the first type that is known
+# to the classification table is used (E.g. a JPEG is 'jpg' if the table knows 'jpg', else 'jpeg')
+SIGNATURES = [
+    (0, b'\x89PNG\r\n\x1a\n', ['png']),
+    (0, b'\xff\xd8\xff', ['jpg', 'jpeg']),
+    (0, b'GIF87a', ['gif']),
+    (0, b'GIF89a', ['gif']),
+    (0, b'II*\x00', ['tif', 'tiff']),
+    (0, b'MM\x00*', ['tif', 'tiff']),
+    (0, b'8BPS', ['psd']),
+    (0, b'%PDF-', ['pdf']),
+    (0, b'%!PS', ['ps']),
+    (0, b'{\\rtf', ['rtf']),
+    (0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', ['doc', 'xls', 'ppt']),
+    (0, b'SQLite format 3\x00', ['sqlite', 'db']),
+    (0, b'\x1f\x8b', ['gz', 'tgz']),
+    (0, b'BZh', ['bz2']),
+    (0, b'\xfd7zXZ\x00', ['xz']),
+    (0, b'7z\xbc\xaf\x27\x1c', ['7z']),
+    (0, b'Rar!\x1a\x07', ['rar']),
+    (0, b'\x28\xb5\x2f\xfd', ['zst']),
+    (0, b'\x04\x22\x4d\x18', ['lz4']),
+    (257, b'ustar', ['tar']),
+    (0, b'ID3', ['mp3']),
+    (0, b'fLaC', ['flac']),
+    (0, b'OggS', ['ogg']),
+    (0, b'MThd', ['mid', 'midi']),
+    (0, b'\x1a\x45\xdf\xa3', ['mkv', 'webm']),
+    (0, b'FLV\x01', ['flv']),
+    (0, b'0&\xb2u\x8ef\xcf\x11', ['wmv', 'wma']),
+    (0, b'FWS', ['swf']),
+    (0, b'CWS', ['swf']),
+    (0, b'\x7fELF', ['elf', 'so']),
+    (0, b'MZ', ['exe', 'dll']),
+    (0, b'\xca\xfe\xba\xbe', ['class']),
+    (0, b'\x00asm', ['wasm']),
+    (0, b'wOFF', ['woff']),
+    (0, b'wOF2', ['woff2']),
+    (0, b'OTTO', ['otf']),
+    (0, b'\x00\x01\x00\x00\x00', ['ttf']),
+]
+
+# Types of the container formats, detected from the data after the magic bytes
+RIFF_TYPES = {b'WAVE': ['wav'], b'AVI ': ['avi'], b'WEBP': ['webp']}
+FTYP_BRANDS = {b'M4A ': ['m4a', 'mp4'], b'qt  ': ['mov', 'mp4'], b'heic': ['heic'], b'mif1': ['heic']}
+ZIP_MARKERS = [(b'mimetypeapplication/epub+zip', ['epub']),
+               (b'mimetypeapplication/vnd.oasis.opendocument.text', ['odt']),
+               (b'word/', ['docx']),
+               (b'xl/', ['xlsx']),
+               (b'ppt/', ['pptx']),
+               (b'META-INF/', ['jar', 'zip'])]
+
+
+def get_candidate_types(header):
+    """
+    Returns the possible file types (list, in the order of preference) of a file from its header, empty list if unknown
+
+    Parameters:
+    ---
+    header: bytes
+        First bytes of the file
+    """
+    if header[:4] == b'RIFF':
+        return RIFF_TYPES.get(header[8:12], [])
+    if header[4:8] == b'ftyp':
+        return FTYP_BRANDS.get(header[8:12], ['mp4'])
+    if header[:4] == b'PK\x03\x04':
+        for marker, file_types in ZIP_MARKERS:
+            if marker in header:
+                return file_types
+        return ['zip']
+    if header[:2] == b'#!':
+        first_line = header.split(b'\n', 1)[0]
+        return ['py'] if b'python' in first_line else ['sh']
+
+    for offset, magic, file_types in SIGNATURES:
+        if header[offset: offset + len(magic)] == magic:
+            return file_types
+
+    text = header.lstrip()[:512].lower()
+    if text.startswith(b'<?xml'):
+        return ['svg', 'xml'] if b'<svg' in text else ['xml']
+    if text.startswith(b'<!doctype html') or text.startswith(b'<html'):
+        return ['html', 'htm']
+    if text.startswith(b'<svg'):
+        return ['svg']
+    return []
+
+
+def read_header(file_path, size=HEADER_SIZE):
+    """
+    Returns the first size bytes of a file (a single read)
+
+    Parameters:
+    ---
+    file_path: str
+        Path of the file
+    size: int
+        Number of bytes to read (default HEADER_SIZE)
+    """
+    fd = os.open(file_path, os.O_RDONLY)
+    try:
+        return os.read(fd, size)
+    finally:
+        os.close(fd)
+
+
+class ContentSniffer():
+    """
+        Detects the type of the files from their content, caches the detected types by (size, mtime, inode)
+    """
+
+    def __init__(self):
+        # (size, mtime, inode) => list of candidate file types
+        self.__cache = {}
+
+    def sniff(self, file_path, is_known=None):
+        """
+        Returns the file type of a file detected from its content, None if unknown
+
+        Parameters:
+        ---
+        file_path: str
+            Path of the file
+        is_known: callable
+            Function which returns True if a file type is known to the classification table.
+            The first candidate type which is known is returned.  None to return the first candidate type (default None)
+        """
+        try:
+            stat = os.stat(file_path)
+            key = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+            file_types = self.__cache.get(key)
+            if file_types is None:
+                file_types = get_candidate_types(
+                    read_header(file_path)) if stat.st_size else []
+                self.__cache[key] = file_types
+        except OSError:
+            return None
+
+        for file_type in file_types:
+            if is_known is None or is_known(file_type):
+                return file_type
+        return None
@@ -0,0 +1,156 @@
+"""
+A Module to pick collision-free destinations for the moved files
+
+The names of a destination directory are listed once (a single scandir) into memory, which are then updated with
+every name handed out, so picking a free name never costs an exists() call per candidate name.
+A lock per directory makes the reservation of a name atomic, so concurrent workers never pick the same destination.
+The names are compared case-insensitively (as on NTFS & the default APFS), so a file is never moved over another file
+whose name differs just by case (E.g. report.pdf over Report.PDF).
+"""
+
+import filecmp
+import os
+from os.path import basename, dirname, join, splitext
+import threading
+
+# What to do when the destination of a file already exists (or is already taken by another move)
+POLICY_SKIP = 'skip'
+POLICY_RENAME = 'rename'
+POLICY_OVERWRITE_IDENTICAL = 'overwrite-identical'
+POLICIES = [POLICY_SKIP, POLICY_RENAME, POLICY_OVERWRITE_IDENTICAL]
+
+
+def get_numbered_name(name, counter):
+    """
+    Returns a name with a counter before its extension
+
+    Parameters:
+    ---
+    name: str
+        Name of a file
+    counter: int
+        Number to add to the name
+
+    Example:
+    ---
+    get_numbered_name('report.pdf', 2) => 'report (2).pdf'
+    """
+    stem, ext = splitext(name)
+    return f"{stem} ({counter}){ext}"
+
+
+def get_name_key(name):
+    """
+    Returns the key of a name in the names of a directory (case-folded)
+
+    Parameters:
+    ---
+    name: str
+        Name of a file
+
+    Example:
+    ---
+    get_name_key('Report.PDF') => 'report.pdf'
+    """
+    return name.casefold()
+
+
+def is_identical(file_path, other_file_path):
+    """
+    Returns True if both the files have the same content, False if not (or if any of them can't be read)
+
+    Parameters:
+    ---
+    file_path: str
+        Path of a file
+    other_file_path: str
+        Path of the other file
+    """
+    try:
+        return filecmp.cmp(file_path, other_file_path, shallow=False)
+    except OSError:
+        return False
+
+
+class DestinationNames():
+    """
+        Names of the destination directories (thread-safe), to resolve the destination of each move using a policy
+    """
+
+    def __init__(self, policy=POLICY_RENAME):
+        """
+        Parameters:
+        ---
+        policy: str
+            One of POLICIES (default POLICY_RENAME)
+                skip => The file is left in place
+                rename => The file is renamed with a counter (E.g. report (1).pdf)
+                overwrite-identical => The destination is overwritten, if it has the same content, else the file is left in place
+        """
+        self.__policy = policy
+        # directory => name (see get_name_key) => path of the file whose content is (or will be) at that name
+        self.__names = {}
+        # (directory, name) => next counter to try for the name
+        self.__counters = {}
+        # directory => lock of the directory
+        self.__locks = {}
+        self.__lock = threading.Lock()
+
+    def __get_lock(self, directory):
+        """
+        Returns the lock of a directory
+        """
+        with self.__lock:
+            return self.__locks.setdefault(directory, threading.Lock())
+
+    def __get_names(self, directory):
+        """
+        Returns the names of a directory, listed once (Caller must hold the lock of the directory)
+        """
+        names = self.__names.get(directory)
+        if names is None:
+            try:
+                with os.scandir(directory) as entries:
+                    names = {get_name_key(entry.name): entry.path for entry in entries}
+            except (FileNotFoundError, NotADirectoryError):
+                # The move itself reports the error, if the directory can't be created
+                names = {}
+            self.__names[directory] = names
+        return names
+
+    def reserve(self, source, destination):
+        """
+        Returns the destination to move a file to (reserved for it), None if the file is to be left in place
+
+        Parameters:
+        ---
+        source: str
+            Path of the file to move
+        destination: str
+            Planned destination of the file
+        """
+        directory = dirname(destination)
+        name = basename(destination)
+        with self.__get_lock(directory):
+            names = self.__get_names(directory)
+            key = get_name_key(name)
+            current = names.get(key)
+            if current is None or current == source:
+                names[key] = source
+                return destination
+
+            if self.__policy == POLICY_RENAME:
+                counter = self.__counters.get((directory, key), 1)
+                while get_name_key(get_numbered_name(name, counter)) in names:
+                    counter += 1
+                self.__counters[(directory, key)] = counter + 1
+                new_name = get_numbered_name(name, counter)
+                names[get_name_key(new_name)] = source
+                return join(directory, new_name)
+
+            # The content at the name is compared with the destination too, as a planned move may be done already
+            if self.__policy == POLICY_OVERWRITE_IDENTICAL and (
+                    is_identical(source, current) or is_identical(source, destination)):
+                names[key] = source
+                return destination
+            return None
@@ -0,0 +1,156 @@
+"""
+A Module to persist a manifest (SQLite) of the scanned directories, so that the next cleaning skips unchanged directories
+
+For each directory the manifest stores its mtime, its sub-directories and the number of files left in it after the cleaning.
+A directory whose mtime is unchanged has no new entries, so it is not listed again (its sub-directories are taken from
+the manifest and checked the same way) and its files are not classified again.
+
+The manifest also stores the signature of the configs it was built with.  When the configs change (E.g. a path is set
+for a file type which was left in place), every directory is scanned again.
+"""
+
+import json
+import os
+import sqlite3
+
+
+class DirectoryManifest():
+    """
+        Manifest of the scanned directories of a cleaning
+    """
+
+    def __init__(self, manifest_path, signature=None):
+        """
+        Parameters:
+        ---
+        manifest_path: str
+            Path of the SQLite manifest (created if not exists)
+        signature: str
+            Signature of the configs used to classify the files (see classification_cache.get_sources_signature).
+            All the directories of the manifest are dropped, if it differs from the stored one (default None)
+        """
+        self.__manifest_path = manifest_path
+        self.__signature = signature
+        connection = self.__connect()
+        try:
+            row = connection.execute(
+                "SELECT value FROM meta WHERE key = 'signature'").fetchone()
+            self.__outdated = (row[0] if row else None) != signature
+            # Loading the whole manifest with a single query, instead of a query per directory
+            self.__directories = {} if self.__outdated else {
+                path: (mtime, json.loads(sub_dirs), files)
+                for path, mtime, sub_dirs, files in connection.execute(
+                    'SELECT path, mtime, sub_dirs, files FROM directories')
+            }
+        finally:
+            connection.close()
+        # Directories scanned in this cleaning => (mtime before the scan, names of the entries seen, sub-directories)
+        self.__scanned = {}
+        self.dirs_scanned = 0
+        self.dirs_skipped = 0
+        self.files_scanned = 0
+        self.files_skipped = 0
+
+    def __connect(self):
+        """
+        Returns a new connection to the manifest (creates the table, if not exists)
+        """
+        connection = sqlite3.connect(self.__manifest_path)
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS directories '
+            '(path TEXT PRIMARY KEY, mtime INTEGER, sub_dirs TEXT, files INTEGER)')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        return connection
+
+    def get_unchanged_sub_dirs(self, directory, mtime):
+        """
+        Returns the sub-directories of a directory from the manifest, if the directory is unchanged, else None
+
+        Parameters:
+        ---
+        directory: str
+            Path of the directory
+        mtime: int
+            Current mtime (in nanoseconds) of the directory
+        """
+        entry = self.__directories.get(directory)
+        if entry is None or entry[0] != mtime:
+            return None
+        self.dirs_skipped += 1
+        self.files_skipped += entry[2]
+        return entry[1]
+
+    def record_scan(self, directory, mtime, names, sub_dirs, files):
+        """
+        Records a scanned directory
+
+        Parameters:
+        ---
+        directory: str
+            Path of the directory
+        mtime: int
+            mtime (in nanoseconds) of the directory before it was scanned
+        names: set
+            Names of all the entries seen while scanning the directory
+        sub_dirs: list
+            Names of the sub-directories to descend into
+        files: int
+            Number of files found in the directory
+        """
+        self.__scanned[directory] = (mtime, names, sub_dirs)
+        self.dirs_scanned += 1
+        self.files_scanned += files
+
+    def save(self, skip_dirs=None):
+        """
+        Stores the scanned directories in the manifest, with their mtime after the cleaning
+
+        A directory is stored only if every entry it has now was seen while scanning it (or is a category folder),
+        so a file that lands in a directory while it is being cleaned makes the directory to be scanned again next time.
+
+        Parameters:
+        ---
+        skip_dirs: set
+            Names of the directories created by the cleaner (E.g. Category folders)
+        """
+        skip_dirs = skip_dirs or set()
+        rows = []
+        stale = []
+        for directory, (mtime, names, sub_dirs) in self.__scanned.items():
+            try:
+                current_mtime = os.stat(directory).st_mtime_ns
+                with os.scandir(directory) as entries:
+                    current = [entry for entry in entries
+                               if entry.name not in skip_dirs or not entry.is_dir(follow_symlinks=False)]
+            except OSError:
+                stale.append((directory,))
+                continue
+            if current_mtime != mtime and any(entry.name not in names for entry in current):
+                stale.append((directory,))
+                continue
+            files = sum(1 for entry in current if entry.is_file())
+            rows.append((directory, current_mtime, json.dumps(sub_dirs), files))
+
+        connection = self.__connect()
+        try:
+            with connection:
+                if self.__outdated:
+                    connection.execute('DELETE FROM directories')
+                    connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('signature', ?)",
+                                       (self.__signature,))
+                    self.__outdated = False
+                connection.executemany(
+                    'INSERT OR REPLACE INTO directories (path, mtime, sub_dirs, files) VALUES (?, ?, ?, ?)', rows)
+                connection.executemany(
+                    'DELETE FROM directories WHERE path = ?', stale)
+        finally:
+            connection.close()
+        self.__scanned = {}
+
+    def print_summary(self):
+        """
+        Displays the number of directories/files skipped versus processed
+        """
+        print(f"Directories: {self.dirs_scanned} scanned, {self.dirs_skipped} skipped (unchanged)")
+        print(f"Files: {self.files_scanned} processed, {self.files_skipped} skipped (unchanged)")
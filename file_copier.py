@@ -0,0 +1,144 @@
+"""
+A Module to copy files across filesystems as fast as the kernel allows
+
+A copy is tried with the fastest available method first
+    1. reflink (FICLONE ioctl) => Shares the data blocks on copy-on-write filesystems (btrfs, XFS), no data is copied
+    2. os.copy_file_range => Kernel-side copy, the data never passes through the user-space
+    3. os.sendfile => Kernel-side copy (older kernels)
+    4. shutil.copyfileobj => Plain read/write loop (other platforms)
+"""
+
+import errno
+import os
+from os.path import basename, dirname, join
+import shutil
+
+# ioctl request to clone a file (_IOW(0x94, 9, int))
+FICLONE = 0x40049409
+
+# Number of bytes to copy per call of copy_file_range/sendfile
+CHUNK_SIZE = 64 * 1024 * 1024
+
+# errno values which mean that a copy method is not supported for a pair of files
+UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP,
+                      errno.ENOTTY, errno.EBADF, errno.EPERM}
+
+
+def reflink(src_fd, dst_fd):
+    """
+    Clones the content of src_fd into dst_fd (reflink) and Returns True, False if not supported
+
+    Parameters:
+    ---
+    src_fd: int
+        File Descriptor of the source file
+    dst_fd: int
+        File Descriptor of the destination file
+    """
+    try:
+        import fcntl
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        return True
+    except (ImportError, OSError):
+        return False
+
+
+def copy_range(copy, src_fd, dst_fd, size):
+    """
+    Copies size bytes from src_fd to dst_fd using a kernel-side copy function and Returns True, False if not supported
+
+    Parameters:
+    ---
+    copy: callable
+        os.copy_file_range / os.sendfile like function (src_fd, dst_fd, count) => number of bytes copied
+    src_fd: int
+        File Descriptor of the source file
+    dst_fd: int
+        File Descriptor of the destination file
+    size: int
+        Number of bytes to copy
+    """
+    copied = 0
+    try:
+        while copied < size:
+            count = copy(src_fd, dst_fd, min(CHUNK_SIZE, size - copied))
+            # Source got truncated while copying
+            if count == 0:
+                break
+            copied += count
+    except OSError as e:
+        # Nothing is written yet, so another method can be tried
+        if e.errno in UNSUPPORTED_ERRNOS and copied == 0:
+            return False
+        raise
+    return True
+
+
+def copy_file_content(src_fd, dst_fd, size):
+    """
+    Copies the content of src_fd to dst_fd using the fastest available method
+
+    Parameters:
+    ---
+    src_fd: int
+        File Descriptor of the source file
+    dst_fd: int
+        File Descriptor of the destination file (empty)
+    size: int
+        Size of the source file
+    """
+    if reflink(src_fd, dst_fd):
+        return
+    if hasattr(os, 'copy_file_range') and copy_range(os.copy_file_range, src_fd, dst_fd, size):
+        return
+    if hasattr(os, 'sendfile') and copy_range(
+            lambda src, dst, count: os.sendfile(dst, src, None, count), src_fd, dst_fd, size):
+        return
+    with open(src_fd, 'rb', closefd=False) as src, open(dst_fd, 'wb', closefd=False) as dst:
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+
+def copy_file(old_path, new_path):
+    """
+    Copies a file (content & metadata) to another path (may be on another filesystem)
+
+    The file is copied to a temporary file next to the new_path and renamed once the copy is verified,
+    so the new_path never has a partial copy.
+
+    Parameters:
+    ---
+    old_path: str
+        Existing File Path (along with the file name)
+    new_path: str
+        New Path where the file is to be copied (along with the file name)
+    """
+    temp_path = join(dirname(new_path), f".{basename(new_path)}.{os.getpid()}.part")
+    try:
+        with open(old_path, 'rb') as src, open(temp_path, 'wb') as dst:
+            size = os.fstat(src.fileno()).st_size
+            copy_file_content(src.fileno(), dst.fileno(), size)
+        copied_size = os.stat(temp_path).st_size
+        if copied_size != size:
+            raise OSError(
+                errno.EIO, f"Copied {copied_size} of {size} bytes", old_path)
+        shutil.copystat(old_path, temp_path)
+        os.replace(temp_path, new_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def move_file_across_devices(old_path, new_path):
+    """
+    Moves a file to another filesystem (copies the file & then deletes the old file)
+
+    Parameters:
+    ---
+    old_path: str
+        Existing File Path (along with the file name)
+    new_path: str
+        New Path where the file is to be moved (along with the file name)
+    """
+    copy_file(old_path, new_path)
+    os.unlink(old_path)
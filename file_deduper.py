@@ -0,0 +1,213 @@
+"""
+A Module to find the duplicate files of a cleaning (files with the same content)
+
+Files are narrowed down in stages, so most of the files are never read completely
+    1. Size => A file with a unique size has no duplicate, so it is never read
+    2. Partial hash => Hash of the first & the last blocks of the files of the same size
+    3. Full hash => Hash of the whole content, just for the files whose partial hashes are the same
+The hashing is done by a thread pool (hashlib releases the GIL while hashing large buffers).
+"""
+
+import os
+from os.path import basename, dirname, join
+
+import folder_cleaner
+import folder_cleaner_constants as fcc
+
+# Number of bytes read from the beginning & the end of a file for its partial hash
+BLOCK_SIZE = 64 * 1024
+
+# Number of bytes read per call while computing a full hash
+CHUNK_SIZE = 1024 * 1024
+
+# Actions to take for the duplicate files
+ACTION_REPORT = 'report'
+ACTION_HARDLINK = 'hardlink'
+ACTION_MOVE = 'move'
+ACTIONS = [ACTION_REPORT, ACTION_HARDLINK, ACTION_MOVE]
+
+# Name of the category folder the duplicate files are moved into (ACTION_MOVE)
+DUPLICATES_DIR = 'Duplicates'
+
+
+def get_partial_hash(file_path, size):
+    """
+    Returns the hash (hex) of the first & the last BLOCK_SIZE bytes of a file (the whole file, if it is small)
+
+    Parameters:
+    ---
+    file_path: str
+        Path of the file
+    size: int
+        Size of the file
+    """
+    import hashlib  # Imported when deduplicating, the app imports this module at startup
+
+    digest = hashlib.blake2b()
+    with open(file_path, 'rb') as fp:
+        digest.update(fp.read(BLOCK_SIZE))
+        if size > 2 * BLOCK_SIZE:
+            fp.seek(size - BLOCK_SIZE)
+        digest.update(fp.read(BLOCK_SIZE))
+    return digest.hexdigest()
+
+
+def get_full_hash(file_path):
+    """
+    Returns the hash (hex) of the whole content of a file
+
+    Parameters:
+    ---
+    file_path: str
+        Path of the file
+    """
+    import hashlib
+
+    digest = hashlib.blake2b()
+    with open(file_path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def group_by(executor, files, key):
+    """
+    Groups the files by key(file) (computed by the executor) and Returns the groups of more than one file
+
+    A file which can't be read is left out.
+
+    Parameters:
+    ---
+    executor: Executor
+        Executor to compute the keys with
+    files: list
+        Files to group
+    key: callable
+        Function (file) => key
+    """
+    def safe_key(file):
+        try:
+            return key(file)
+        except OSError:
+            return None
+
+    groups = {}
+    for file, file_key in zip(files, executor.map(safe_key, files)):
+        if file_key is not None:
+            groups.setdefault(file_key, []).append(file)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def find_duplicates(files, workers=4):
+    """
+    Returns the groups of duplicate files (list of lists).  The first file of a group is the original (oldest file),
+    the rest are its duplicates
+
+    Empty files are not considered as duplicates.
+
+    Parameters:
+    ---
+    files: list
+        Paths of the files
+    workers: int
+        Number of threads to hash the files with (default 4)
+    """
+    stats = {}
+    by_size = {}
+    for file in files:
+        try:
+            stat = os.stat(file)
+        except OSError:
+            continue
+        if stat.st_size:
+            stats[file] = stat
+            by_size.setdefault(stat.st_size, []).append(file)
+
+    # Hard links of the same file are the same content, not duplicates
+    candidates = []
+    for same_size in by_size.values():
+        inodes = {}
+        for file in same_size:
+            inodes.setdefault((stats[file].st_dev, stats[file].st_ino), file)
+        if len(inodes) > 1:
+            candidates.append(list(inodes.values()))
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    duplicates = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for same_size in candidates:
+            size = stats[same_size[0]].st_size
+            for same_partial in group_by(executor, same_size, lambda file: get_partial_hash(file, size)):
+                # The partial hash of a small file is the hash of its whole content
+                same_content = [same_partial] if size <= 2 * BLOCK_SIZE else group_by(
+                    executor, same_partial, get_full_hash)
+                for group in same_content:
+                    duplicates.append(sorted(
+                        group, key=lambda file: (stats[file].st_mtime_ns, file)))
+    return duplicates
+
+
+def hardlink_duplicates(duplicates):
+    """
+    Replaces the duplicate files with hard links to their original file and Returns the number of bytes freed
+
+    The replacement is atomic (a link is created next to the duplicate & renamed over it).
+    A duplicate on another filesystem than its original is left as it is.
+
+    Parameters:
+    ---
+    duplicates: list
+        Groups of duplicate files (see find_duplicates)
+    """
+    freed = 0
+    for original, *copies in duplicates:
+        for file in copies:
+            temp_path = join(dirname(file), f".{basename(file)}.{os.getpid()}.link")
+            try:
+                size = os.stat(file).st_size
+                os.link(original, temp_path)
+                os.replace(temp_path, file)
+                freed += size
+            except OSError:
+                if os.path.lexists(temp_path):
+                    os.remove(temp_path)
+    return freed
+
+
+def get_duplicate_moves(duplicates, folder_to_clean):
+    """
+    Returns a list of folder_cleaner.Move to move the duplicate files into the Duplicates folder
+
+    Parameters:
+    ---
+    duplicates: list
+        Groups of duplicate files (see find_duplicates)
+    folder_to_clean: str
+        Folder in which the Duplicates folder is created
+    """
+    new_dir = join(folder_to_clean, DUPLICATES_DIR)
+    return [folder_cleaner.Move(file, join(new_dir, basename(file)), fcc.REASON_DUPLICATE)
+            for _, *copies in duplicates for file in copies]
+
+
+def print_duplicates(duplicates):
+    """
+    Displays the groups of duplicate files along with the number of bytes wasted by them
+
+    Parameters:
+    ---
+    duplicates: list
+        Groups of duplicate files (see find_duplicates)
+    """
+    wasted = 0
+    for original, *copies in duplicates:
+        print(f"[ORIGINAL] {original}")
+        for file in copies:
+            print(f"    [DUPLICATE] {file}")
+            try:
+                wasted += os.stat(file).st_size
+            except OSError:
+                pass
+    print(f"{sum(len(group) - 1 for group in duplicates)} duplicate file(s) in {len(duplicates)} group(s), "
+          f"{wasted} byte(s) wasted")
@@ -1,12 +1,34 @@
 from multiprocessing import Process
 from pprint import pprint
 import json
+import os
 
-import requests
 from bs4 import BeautifulSoup
 
 from file_formats_scrapper.utils import Utils
 
+try:
+    import lxml  # noqa: F401
+    DEFAULT_PARSER = 'lxml'
+except ImportError:
+    DEFAULT_PARSER = 'html.parser'
+
+HEADINGS = ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']
+
+
+def scrap_section(html, parser=DEFAULT_PARSER):
+    """
+        Scraps a section of the page from its HTML fragment (run in a worker process) and Returns its file_types JSON Object
+
+        Parameters:
+        ---
+        html: str
+            HTML fragment of the section, with a table of contents of the section alone
+        parser: str
+            Parser of BeautifulSoup (default DEFAULT_PARSER)
+    """
+    return FileFormatsScrapper(parser=parser, html=html).scrap()
+
 
 class FileFormatsScrapper():
     """
@@ -16,15 +38,31 @@ class FileFormatsScrapper():
     __MSG_GEN_JSON = 'Generating Filetypes JSON'
     __MSG_JSON_SCRAPPED = '✓ JSON Generated Successfully :)'
 
-    def __init__(self):
-        self.__url = 'https://en.wikipedia.org/wiki/List_of_file_formats'
-        self.__soup = self.__get_soup()
+    URL = 'https://en.wikipedia.org/wiki/List_of_file_formats'
+
+    def __init__(self, source=URL, parser=DEFAULT_PARSER, html=None):
+        """
+            Parameters:
+            ---
+            source: str
+                URL of the page or Path of a local HTML file of the page (E.g. saved for an offline run) (default URL)
+            parser: str
+                Parser of BeautifulSoup (default lxml if installed, else html.parser)
+            html: str
+                HTML of the page, to parse instead of fetching the source (default None)
+        """
+        self.__source = source
+        self.__parser = parser
+        # The page is fetched & parsed once
+        self.__soup = BeautifulSoup(html, parser) if html is not None else self.__get_soup()
+        # id => element, built in a single pass, to avoid a full-document search per type
+        self.__elements_by_id = self.__index_ids(self.__soup)
         self.__NOT_A_FILE_TYPES = ['see also', 'references', 'external links']
         self.__TOC_SELECTOR = '#toc > ul'
         self.__TOC_TEXT_SELECTOR = '.toctext'
         self.__file_type_info = {}
 
-    def scrap(self, spin=False):
+    def scrap(self, spin=False, workers=1):
         """
             Scrap all the file formats from self.url and returns a result in the JSON format
             Returns the scrapped file_types JSON Object
@@ -33,18 +71,20 @@ class FileFormatsScrapper():
             ---
             spin: bool
                 Flag that decides whether to display a spinner or not (default False)
+            workers: int
+                Number of processes to parse the top-level sections with (default 1 => parsed in this process)
         """
 
         # Start Spinning
         spnr = Utils.start_spinner(spin, 
                 msg=FileFormatsScrapper.__MSG_GEN_JSON)
 
-        # Get a soup to parse a HTML of the Site
-        soup = self.__get_soup()
-
         # Selector to fetch the Table of Conetents page (to fetch type and sub-types)
-        file_types = soup.select_one(self.__TOC_SELECTOR)
-        self.__extract_data_from_a_tag(file_types)
+        file_types = self.__soup.select_one(self.__TOC_SELECTOR)
+        if workers > 1:
+            self.__scrap_sections(file_types, workers)
+        else:
+            self.__extract_data_from_a_tag(file_types)
 
         # Stop Spinning
         Utils.stop_spinner(spnr, msg=FileFormatsScrapper.__MSG_JSON_SCRAPPED)
@@ -52,6 +92,57 @@ class FileFormatsScrapper():
         # Return the file_types JSON object
         return self.__file_type_info
 
+    def __scrap_sections(self, toc_tag, workers):
+        """
+            Parses each top-level section in a process pool and merges the results into self.file_type_info (in the order of the TOC,
+            so the result is the same as the one of __extract_data_from_a_tag)
+
+            Parameters:
+            ---
+            toc_tag: Tag
+                BeautifulSoup Tag of the <ul/> tag of the TOC
+            workers: int
+                Number of processes
+        """
+        # Imported lazily, as the pool is not needed by a serial scrap
+        from concurrent.futures import ProcessPoolExecutor
+
+        fragments = []
+        for toc_item in toc_tag.find_all('li', recursive=False):
+            type_name = toc_item.select_one(self.__TOC_TEXT_SELECTOR).getText()
+            if self.__clean_type(type_name) not in self.__NOT_A_FILE_TYPES:
+                # Each worker gets the TOC entry of its section and the HTML of the section alone, not the whole page
+                fragments.append(f"<div id='toc'><ul>{toc_item}</ul></div>" +
+                                 self.__get_section_html(Utils.replace_white_space(type_name)))
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for section_info in executor.map(scrap_section, fragments, [self.__parser] * len(fragments)):
+                self.__file_type_info.update(section_info)
+
+    def __get_section_html(self, element_id):
+        """
+            Returns the HTML of a section, from the heading of the element that has the element_id up to the next heading of the same level
+            (the sub-sections are included), empty if the element is not found
+
+            Parameters:
+            ---
+            element_id: str
+                id of the element of the heading of the section
+        """
+        element = self.__elements_by_id.get(element_id)
+        if element is None:
+            return ''
+
+        heading = element.parent
+        # The next section starts with a heading of the same (or a higher) level
+        stop_headings = HEADINGS[:HEADINGS.index(heading.name) + 1] if heading.name in HEADINGS else HEADINGS
+        parts = [str(heading)]
+        for sibling in heading.next_siblings:
+            if sibling.name in stop_headings:
+                break
+            parts.append(str(sibling))
+        return ''.join(parts)
+
     def __clean_type(self, type_name):
         """
         Returns a file_type by Removing the unnecessary leading and trailing spaces and lower the type
@@ -141,31 +232,32 @@ class FileFormatsScrapper():
 
                 # The Page stores all the types into the tag that has the file type name (seperated by _ instead of space) as its id
                 # E.g. types of 'web page' will be stored inside the tag that has a id 'web_page'
-                selector = f"[id='{Utils.replace_white_space(type_name)}']"
+                element_id = Utils.replace_white_space(type_name)
 
                 Utils.set_dict(self.__file_type_info, keys,
-                               self.__extract_types_from_a_selector(selector))
+                               self.__extract_types_from_an_id(element_id))
                 # Popping the types key
                 keys.pop()
 
                 # Popping the type_name key
                 keys.pop()
 
-    def __extract_types_from_a_selector(self, css_selector):
+    def __extract_types_from_an_id(self, element_id):
         """
-            Extract and returns all file types from the parent tag, that you specified by a css_selector
+            Extract and returns all file types from the parent tag of the element that has the element_id
             Returns => file_types => List of file types
 
             Parameters:
             ---
-            css_selector: str 
-                CSS Selector for a parent tag that contains all the valid file types            
+            element_id: str
+                id of the element, whose parent tag contains all the valid file types
         """
-        element = self.__soup.select_one(css_selector)
-        # parent = element.parent
+        element = self.__elements_by_id.get(element_id)
 
         file_types = []
-        headings = ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']
+        if element is None:
+            return file_types
+        headings = HEADINGS
 
         element_to_process = element.parent
         # Process types from element_to_process until it doesn't become heading (which represents the next category or the next sub-category)
@@ -347,10 +439,36 @@ class FileFormatsScrapper():
             }
         }
 
+    def __get_html(self):
+        """
+            Returns the HTML of the source (read from the local file, if the source is a file, else requested from the URL)
+        """
+        if os.path.isfile(self.__source):
+            with open(self.__source, encoding='utf-8') as fp:
+                return fp.read()
+
+        # Imported lazily, so that an offline run doesn't need requests
+        import requests
+        response = requests.get(self.__source)
+        response.raise_for_status()
+        return response.text
+
     def __get_soup(self):
         """
-            Send request to the URL and get a soup object that represents the structure of the URL
+            Get a soup object that represents the structure of the source
+        """
+        return BeautifulSoup(self.__get_html(), self.__parser)
+
+    def __index_ids(self, soup):
+        """
+            Returns a dictionary of all the elements of the soup by their id (the first element wins, like select_one)
+
+            Parameters:
+            ---
+            soup: BeautifulSoup
+                Soup to index
         """
-        response = requests.get(
-            'https://en.wikipedia.org/wiki/List_of_file_formats')
-        return BeautifulSoup(response.text, 'html.parser')
+        elements_by_id = {}
+        for element in soup.find_all(id=True):
+            elements_by_id.setdefault(element['id'], element)
+        return elements_by_id
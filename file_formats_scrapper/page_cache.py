@@ -0,0 +1,116 @@
+import json
+import os
+from os.path import exists, join
+
+
+class PageCache():
+    """
+        Local copy of a page along with its ETag / Last-Modified, to refresh it with a conditional request
+    """
+
+    __HTML_FILE = 'page.html'
+    __META_FILE = 'page.json'
+    __PENDING_FILE = 'page.html.new'
+
+    def __init__(self, cache_dir):
+        """
+            Parameters:
+            ---
+            cache_dir: str
+                Folder to store the copy of the page in (created if not exists)
+        """
+        self.cache_dir = cache_dir
+        self.html_path = join(cache_dir, PageCache.__HTML_FILE)
+        self.__meta_path = join(cache_dir, PageCache.__META_FILE)
+        self.__pending_path = join(cache_dir, PageCache.__PENDING_FILE)
+        # Metadata of the page fetched last & True if its HTML is pending, until save() is called
+        self.__pending = None
+
+    def __read_meta(self, url):
+        """
+            Returns the metadata of the cached page, None if the page of the url is not cached
+        """
+        if not exists(self.html_path):
+            return None
+        try:
+            with open(self.__meta_path) as fp:
+                meta = json.load(fp)
+        except (OSError, ValueError):
+            return None
+        return meta if meta.get('url') == url else None
+
+    def __write(self, path, content):
+        """
+            Writes a file atomically (an interrupted refresh never leaves a partial page)
+        """
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as fp:
+            fp.write(content)
+        os.replace(temp_path, path)
+
+    def fetch(self, url, timeout=30):
+        """
+            Fetches the page with a conditional request and Returns (path of the HTML to parse, True if the page changed)
+            The page is considered as changed, when it was not cached yet.
+            The fetched page & its ETag / Last-Modified replace the local copy only when save() is called (once the
+            config is built from it), so a failed update fetches the page again instead of finding it unchanged
+
+            Parameters:
+            ---
+            url: str
+                URL of the page
+            timeout: number
+                Seconds to wait for the server (default 30)
+        """
+        # Imported lazily, so that reading the local copy doesn't need requests
+        import requests
+
+        self.__pending = None
+        meta = self.__read_meta(url)
+        headers = {}
+        if meta:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        response = requests.get(url, headers=headers, timeout=timeout)
+        if meta and response.status_code == 304:
+            return self.html_path, False
+        response.raise_for_status()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Servers without validators send the whole page every time, so the content tells if it changed
+        changed = meta is None or self.read() != response.text
+        self.__pending = ({
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified')
+        }, changed)
+        if not changed:
+            return self.html_path, False
+        self.__write(self.__pending_path, response.text)
+        return self.__pending_path, True
+
+    def save(self):
+        """
+            Keeps the page fetched last (along with its ETag / Last-Modified) as the local copy.
+            Does nothing if the page was not fetched or the server answered it is unchanged
+        """
+        if self.__pending is None:
+            return
+        meta, changed = self.__pending
+        if changed:
+            os.replace(self.__pending_path, self.html_path)
+        self.__write(self.__meta_path, json.dumps(meta, indent=4))
+        self.__pending = None
+
+    def read(self):
+        """
+            Returns the HTML of the local copy, None if not cached
+        """
+        try:
+            with open(self.html_path, encoding='utf-8') as fp:
+                return fp.read()
+        except FileNotFoundError:
+            return None
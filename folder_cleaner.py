@@ -2,17 +2,28 @@
 A Module which contains helper methods to clean a folder
 """
 
+from collections import namedtuple
+import errno
+import itertools
 import json
 import os
-from os.path import isfile, join, exists, basename
+from os.path import join, exists, basename, dirname
 from pathlib import Path
 import shutil
 
-import spinner
+import classification_cache
+import clean_stats
+import destination_names
+import file_deduper
 import folder_cleaner_constants as fcc
+import unknown_types
 import user_config_constants as usc
+import user_config_store
 import utils
 
+# A single planned move of a file (reason => why the file is moved, one of the fcc.REASON_* constants)
+Move = namedtuple('Move', ['source', 'destination', 'reason'])
+
 
 def scan_directory(directory):
     """
@@ -23,11 +34,63 @@ def scan_directory(directory):
     directory: str
         complete path of a directory to be scanned
     """
-    files = [join(directory, content) for content in os.listdir(
-        directory) if isfile(join(directory, content))]
+    with os.scandir(directory) as entries:
+        # DirEntry.is_file() uses the file type cached by scandir, instead of an extra stat per entry
+        files = [entry.path for entry in entries if entry.is_file()]
     return files
 
 
+def walk_directory(directory, max_depth=None, skip_dirs=None, depth=0, manifest=None):
+    """
+    Recursively yields all the files (DirEntry objects of files only) of a directory and its sub-directories
+
+    Files of a directory are yielded while it is being scanned, so the caller can process them before the scan completes.
+
+    Parameters:
+    ---
+    directory: str
+        complete path of a directory to be scanned
+    max_depth: int
+        Maximum depth of the sub-directories to descend into (0 => just the directory itself).  None for no limit (default None)
+    skip_dirs: set
+        Names of the direct sub-directories of the root not to descend into (E.g. Category folders created by the cleaner).
+        Deeper directories with the same names are user folders, which are walked
+    depth: int
+        Depth of the directory being scanned (default 0)
+    manifest: DirectoryManifest
+        Manifest of the previous cleanings.  Unchanged directories are not listed (their files are not yielded),
+        only their sub-directories are walked (default None => list every directory)
+    """
+    # Category folders are created at the root only
+    skip_dirs = (skip_dirs or set()) if depth == 0 else set()
+    sub_dirs = None
+
+    if manifest is not None:
+        mtime = os.stat(directory).st_mtime_ns
+        sub_dirs = manifest.get_unchanged_sub_dirs(directory, mtime)
+
+    if sub_dirs is None:
+        sub_dirs = []
+        names = set()
+        files = 0
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                names.add(entry.name)
+                if entry.is_file():
+                    files += 1
+                    yield entry
+                # Symbolic links to directories are not followed, to avoid cycles
+                elif entry.is_dir(follow_symlinks=False) and entry.name not in skip_dirs:
+                    sub_dirs.append(entry.name)
+        if manifest is not None:
+            manifest.record_scan(directory, mtime, names, sub_dirs, files)
+
+    # Descending after closing the scandir iterator, so that only one directory is open at a time
+    if max_depth is None or depth < max_depth:
+        for sub_dir in sub_dirs:
+            yield from walk_directory(join(directory, sub_dir), max_depth, skip_dirs, depth + 1, manifest)
+
+
 def create_directory(dir_full_name):
     """
     Creates a Hierarchy of Nested Directories if not exist
@@ -38,13 +101,16 @@ def create_directory(dir_full_name):
         Complete path of a nested directories to be created
     """
     if not exists(dir_full_name):
-        os.makedirs(dir_full_name)
+        # exist_ok, as a concurrent worker may create the same (parent) directory in between
+        os.makedirs(dir_full_name, exist_ok=True)
 
 
 def move_file(old_path, new_path):
     """
     Moves file from one path to another path
 
+    If the new_path is on another filesystem, the file is copied (see file_copier) and the old file is deleted.
+
     Parameters:
     ---
     old_path: str
@@ -52,7 +118,69 @@ def move_file(old_path, new_path):
     new_path: str
         New Path where the file is to be moved (along with the file name)
     """
-    os.rename(old_path, new_path)
+    try:
+        # os.replace, so an identical destination is overwritten on Windows too.  The destination is never another file,
+        # even one whose name differs just by case, as it is reserved beforehand (see destination_names)
+        os.replace(old_path, new_path)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        import file_copier  # Imported lazily, just needed for the moves across filesystems
+        file_copier.move_file_across_devices(old_path, new_path)
+
+
+def move_files(moves, workers=1, on_moved=None, stats=None):
+    """
+    Moves files from one path to another path, concurrently if workers > 1
+
+    Every target directory is created once, before any file is moved,
+    so the creation of a target directory never races with the moves into it.
+
+    Parameters:
+    ---
+    moves: list
+        List of (old_path, new_path) tuples
+    workers: int
+        Number of threads to move the files with (default 1 => serial)
+    on_moved: callable
+        Function called with (old_path, new_path) after each move (default None).  Called from the worker threads
+    stats: CleanStats
+        Metrics to record the time of the phases & the moved/errored files in (default None)
+    """
+    with clean_stats.timer(stats, clean_stats.PHASE_CREATE_DIRS):
+        for new_dir in {dirname(new_path) for _, new_path in moves}:
+            create_directory(new_dir)
+
+    def move(old_path, new_path):
+        if stats is None:
+            move_file(old_path, new_path)
+        else:
+            try:
+                size = os.stat(old_path).st_size
+                move_file(old_path, new_path)
+            except OSError:
+                stats.add(files_errored=1)
+                raise
+            stats.add(files_moved=1, bytes_moved=size)
+        if on_moved:
+            on_moved(old_path, new_path)
+
+    with clean_stats.timer(stats, clean_stats.PHASE_MOVE):
+        if workers <= 1 or len(moves) <= 1:
+            for old_path, new_path in moves:
+                move(old_path, new_path)
+            return
+
+        # Imported lazily, to keep the startup of the app fast (concurrent.futures imports logging)
+        from concurrent.futures import ThreadPoolExecutor
+
+        # Moves are independent of each other (E.g. many large files copied across filesystems into the same directory)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(move, old_path, new_path)
+                       for old_path, new_path in moves]
+            # Re-raising the first failure (if any), like the serial path does
+            for future in futures:
+                future.result()
 
 
 def delete_directory(directory):
@@ -105,6 +233,102 @@ def get_full_extension(file_name):
     return Path(file_name).suffixes
 
 
+# Key of a suffix trie node which marks the end of a file type
+SUFFIX_END = None
+
+
+def build_suffix_trie(file_types):
+    """
+    Returns a trie of the compound file types (E.g. tar.gz, clipflair.zip), keyed by their parts in the reverse order
+
+    E.g. ['tar.gz', 'nii.gz'] => {'gz': {'tar': {None: True}, 'nii': {None: True}}}
+    Single file types (E.g. mp4) are not stored, as they are resolved by get_extension.
+
+    Parameters:
+    ---
+    file_types: iterable
+        All the known file types (lower case)
+    """
+    trie = {}
+    for file_type in file_types:
+        parts = file_type.split('.')
+        if len(parts) < 2:
+            continue
+        node = trie
+        for part in reversed(parts):
+            node = node.setdefault(part, {})
+        node[SUFFIX_END] = True
+    return trie
+
+
+def get_known_extensions(suffix_trie: dict, file_name):
+    """
+    Returns the known Extensions of a file, the longest first: its compound extensions matched against the suffix_trie,
+    followed by get_extension
+
+    Each part of the file name is looked up at most once, so it is O(length of the file name).
+
+    Parameters:
+    ---
+    suffix_trie: dict
+        Trie of the compound file types, built using build_suffix_trie
+    file_name: str
+        Name of the File to which you want to get the extensions
+
+    Example:
+    ---
+    get_known_extensions(build_suffix_trie(['tar.gz']), 'archive.tar.gz') => ['.tar.gz', '.gz']
+    """
+    parts = basename(file_name).split('.')
+    node = suffix_trie
+    extensions = []
+    for depth, part in enumerate(reversed(parts), 1):
+        node = node.get(part.lower())
+        if node is None:
+            break
+        if SUFFIX_END in node:
+            extensions.append('.' + '.'.join(parts[-depth:]))
+    extensions.reverse()
+    extensions.append(get_extension(file_name))
+    return extensions
+
+
+def get_known_extension(suffix_trie: dict, file_name):
+    """
+    Returns the longest known Extension of a file, matching its compound extensions against the suffix_trie.
+    Falls back to get_extension, if no compound extension is known
+
+    Parameters:
+    ---
+    suffix_trie: dict
+        Trie of the compound file types, built using build_suffix_trie
+    file_name: str
+        Name of the File to which you want to get the extension
+
+    Example:
+    ---
+    get_known_extension(build_suffix_trie(['tar.gz']), 'archive.tar.gz') => '.tar.gz'
+    """
+    return get_known_extensions(suffix_trie, file_name)[0]
+
+
+def get_user_file_type(user_paths: dict, extensions):
+    """
+    Returns the longest of the extensions (lower case, without .) configured by the user, None if none is configured
+
+    Parameters:
+    ---
+    user_paths: dict
+        File type (lower case) => relative path configured by the user (E.g. UserConfigStore.paths)
+    extensions: list
+        Extensions of a file, the longest first (see get_known_extensions)
+    """
+    for ext in extensions:
+        file_type = ext[1:].lower()
+        if file_type in user_paths:
+            return file_type
+
+
 def get_file_path(file_type_info: dict, search_type, file_path):
     """
     A Method to get a complete hyerarchical path for a file based on it's type
@@ -204,31 +428,169 @@ def get_file_paths(file_type_info, search_type, file_paths):
     return found
 
 
-def move_files_user_config(user_config: dict, files):
+def index_file_types(file_type_info: dict, keys, index):
     """
-    Move files to the corresponding folder path in the user_config dictionary
+    Recursively adds every file type of the file_type_info tree to the index along with its hyerarchical path
 
     Parameters:
+    --
+    file_type_info: dict
+        Parsed JSON Object (or a nested part of it) that contains the details of the file types
+    keys: list
+        Hyerarchical path of the file_type_info dictionary (E.g. ['Graphics', 'Raster graphics'])
+    index: dict
+        Dictionary to store the result of this method call (file_type => list of paths)
+    """
+    for key, value in file_type_info.items():
+        path = tuple(keys) + (key,)
+        types = value.get('types', [])
+
+        # Direct types come first, so that the first path of a type is the same path get_file_path returns
+        for file_type in types:
+            if isinstance(file_type, str):
+                paths = index.setdefault(file_type, [])
+                if path not in paths:
+                    paths.append(path)
+
+        # Unexpected nested types (dictionaries inside a types list)
+        for file_type in types:
+            if isinstance(file_type, dict):
+                index_file_types(file_type, path, index)
+
+        if 'sub_types' in value:
+            index_file_types(value['sub_types'], path, index)
+
+
+def build_file_type_index(file_type_info: dict):
+    """
+    Returns an index of all the file types (file_type => list of all the possible hyerarchical paths)
+
+    Build it once when the config is loaded, and use get_indexed_file_path / get_indexed_file_paths
+    to get the path of a file type, instead of walking the whole file_type_info tree for every file.
+
+    Parameters:
+    --
+    file_type_info: dict
+        Parsed JSON Object that contains the details of all the possible file types
+    """
+    index = {}
+    index_file_types(file_type_info, [], index)
+    return index
+
+
+def get_indexed_file_path(file_type_index: dict, search_type):
+    """
+    Returns a hyerarchical path (list) for a file type from the file_type_index, None if not found
+
+    Parameters:
+    --
+    file_type_index: dict
+        Index of the file types, built using build_file_type_index
+    search_type: str
+        Type of the file you want to get a hyerarchical path
+
+    Example:
     ---
+    get_indexed_file_path(file_type_index, 'PNG') => ['Graphics', 'Raster graphics']
+    """
+    paths = file_type_index.get(search_type.lower())
+    if paths:
+        return list(paths[0])
+
+
+def get_indexed_file_paths(file_type_index: dict, search_type):
+    """
+    Returns all the possible hyerarchical paths (list-of-list) for a file type from the file_type_index
+
+    Parameters:
+    --
+    file_type_index: dict
+        Index of the file types, built using build_file_type_index
+    search_type: str
+        Type of the file you want to get the hyerarchical paths
+    """
+    return [list(path) for path in file_type_index.get(search_type.lower(), [])]
+
+
+def get_category_dirs(file_type_index: dict, user_config: dict):
+    """
+    Returns a set of names of all the top-level directories (category folders) the cleaner may create
+
+    Parameters:
+    ---
+    file_type_index: dict
+        Index of the file types, built using build_file_type_index
     user_config: dict
-        Dictionary that contains the details of file type and it's complete path, 
+        Dictionary that contains the details of file type and it's complete path
+    """
+    category_dirs = set()
+    for paths in file_type_index.values():
+        for path in paths:
+            category_dirs.add(Path('\\'.join(path)).parts[0])
+    for user_path in user_config.values():
+        if user_path != usc.PARENT and Path(user_path).parts:
+            category_dirs.add(Path(user_path).parts[0])
+    return category_dirs
+
+
+def get_user_config_moves(user_paths: dict, files, folder_to_clean=None, suffix_trie=None):
+    """
+    Returns a list of (old_path, new_path) tuples to move files to the corresponding folder path in the user config
+
+    Parameters:
+    ---
+    user_paths: dict
+        File type (lower case) => relative path configured by the user (E.g. UserConfigStore.paths)
     files: list
         List of files to Move
+    folder_to_clean: str
+        Folder in which the configured paths are created (default None => parent folder of each file)
+    suffix_trie: dict
+        Trie of the compound file types, to resolve the compound extensions (default None => last extension only)
     """
+    moves = []
     for file in files:
-        ext = get_extension(file)[1:]
-        file_name = basename(file)
-        folder_to_clean = Path(file).parent
-
-        # Get path from the user_config for a file type
-        user_file_path = user_config.get(ext.lower())
-        if user_file_path is not None:
-            new_dir = folder_to_clean
+        file_type = get_user_file_type(
+            user_paths, get_known_extensions(suffix_trie or {}, file))
+        base_folder = folder_to_clean or Path(file).parent
+
+        # Get path from the user config for a file type
+        if file_type is not None:
+            user_file_path = user_paths[file_type]
+            new_dir = base_folder
             if not user_file_path == usc.PARENT:
-                new_dir = join(folder_to_clean, user_file_path)
+                new_dir = join(base_folder, user_file_path)
             new_file = join(new_dir, basename(file))
-            create_directory(new_dir)
-            move_file(file, new_file)
+            # A file which is already in its place is not moved
+            if new_file != file:
+                moves.append((file, new_file))
+    return moves
+
+
+def move_files_user_config(user_paths: dict, files, folder_to_clean=None, workers=1,
+                           collision_policy=destination_names.POLICY_RENAME):
+    """
+    Move files to the corresponding folder path in the user config and Returns the moves done (list of Move)
+    along with the colliding moves (skipped)
+
+    Parameters:
+    ---
+    user_paths: dict
+        File type (lower case) => relative path configured by the user (E.g. UserConfigStore.paths)
+    files: list
+        List of files to Move
+    folder_to_clean: str
+        Folder in which the configured paths are created (default None => parent folder of each file)
+    workers: int
+        Number of threads to move the files with (default 1 => serial)
+    collision_policy: str
+        What to do when the destination of a file exists already, one of destination_names.POLICIES (default rename)
+    """
+    plan = [Move(old_path, new_path, fcc.REASON_USER_CONFIG) for old_path, new_path
+            in get_user_config_moves(user_paths, files, folder_to_clean)]
+    plan, collisions = find_plan_collisions(plan, collision_policy)
+    execute_plan(plan, workers)
+    return plan, collisions
 
 
 def set_up_test_folder(old_folder, new_folder, log=False):
@@ -266,9 +628,214 @@ def set_up_test_folder(old_folder, new_folder, log=False):
     utils.stop_spinner(spnr, msg=fcc.MSG_SET_ENV_COMPLETED)
 
 
-def clean_folder(config_json_path, user_config_file, folder_to_clean, log=False):
+def get_files_to_clean(folder_to_clean, recursive=False, max_depth=None, skip_dirs=None, manifest=None):
+    """
+    Returns all the files (paths) of the folder_to_clean, that are to be cleaned
+
+    In recursive mode, files are yielded while the directory tree is being scanned.
+
+    Parameters:
+    ---
+    folder_to_clean: str
+        Path of folder to be cleaned
+    recursive: bool
+        Get the files of the sub-directories too (default False)
+    max_depth: int
+        Maximum depth of the sub-directories, when recursive is True.  None for no limit (default None)
+    skip_dirs: set
+        Names of the directories not to descend into (E.g. Category folders created by the cleaner)
+    manifest: DirectoryManifest
+        Manifest of the previous cleanings, to skip the unchanged directories (default None)
+    """
+    if recursive or manifest is not None:
+        max_depth = max_depth if recursive else 0
+        return (entry.path for entry in walk_directory(folder_to_clean, max_depth, skip_dirs, manifest=manifest))
+    return scan_directory(folder_to_clean)
+
+
+def plan_file_moves(table: dict, files, folder_to_clean, sniffer=None):
+    """
+    Classifies the files and Returns a move plan (list of Move) along with the exceptional files (file_type => files)
+
+    Parameters:
+    ---
+    table: dict
+        Classification table (see classification_cache.load_classification_table)
+    files: list
+        Files to be classified
+    folder_to_clean: str
+        Path of folder to be cleaned (Files are moved into the category folders of this folder).
+        Pass the target_root instead, to move the files into the category folders of another folder
+    sniffer: content_sniffer.ContentSniffer
+        Detects the file type from the content of the files which have no extension or an unknown extension.
+        None to classify the files by their extension only (default None)
+    """
+    user_paths = table['user_paths']
+    file_type_index = table['file_type_index']
+    suffix_trie = table['suffix_trie']
+
+    def is_known(file_type):
+        return file_type in user_paths or file_type in file_type_index
+
+    plan = []
+    exceptional_files = {}
+    # Looping over the files
+    for file in files:
+        # Getting the known File Extensions, the longest first (E.g. scan.ps.gz => .ps.gz, .gz)
+        extensions = get_known_extensions(suffix_trie, file)
+
+        # Move Files using user config, which wins over the built-in file types (E.g. gz set by the user over ps.gz)
+        if get_user_file_type(user_paths, extensions) is not None:
+            for old_path, new_path in get_user_config_moves(user_paths, [file], folder_to_clean, suffix_trie):
+                plan.append(Move(old_path, new_path, fcc.REASON_USER_CONFIG))
+            continue
+
+        # Removing . from the longest known File Extension (E.g. .mp4 => mp4, .tar.gz => tar.gz)
+        ext = extensions[0][1:].lower()
+
+        # Getting the Path of the file based on it's extension (ext)
+        file_path = get_indexed_file_path(file_type_index, ext)
+        if file_path:
+            new_dir = join(folder_to_clean, '\\'.join(file_path))
+            plan.append(
+                Move(file, join(new_dir, basename(file)), fcc.REASON_FILE_TYPE))
+            continue
+
+        # Detecting the file type from the content of the file, as its extension is missing/unknown
+        file_type = sniffer.sniff(file, is_known) if sniffer else None
+        if file_type in user_paths:
+            user_path = user_paths[file_type]
+            new_dir = folder_to_clean if user_path == usc.PARENT else join(
+                folder_to_clean, user_path)
+            if join(new_dir, basename(file)) != file:
+                plan.append(
+                    Move(file, join(new_dir, basename(file)), fcc.REASON_CONTENT))
+        elif file_type:
+            new_dir = join(folder_to_clean, '\\'.join(
+                get_indexed_file_path(file_type_index, file_type)))
+            plan.append(
+                Move(file, join(new_dir, basename(file)), fcc.REASON_CONTENT))
+        else:
+            map_file_to_file_type(exceptional_files, ext, file)
+    return plan, exceptional_files
+
+
+def find_plan_collisions(plan, policy=destination_names.POLICY_RENAME):
+    """
+    Returns the plan with collision-free destinations, along with the list of colliding moves which are skipped
+
+    A move collides, if its destination exists already or an earlier move of the plan has the same destination
+    (E.g. files with the same name from different sub-directories in recursive mode).
+
+    Parameters:
+    ---
+    plan: list
+        List of Move
+    policy: str
+        What to do with a colliding move, one of destination_names.POLICIES (default rename)
+    """
+    names = destination_names.DestinationNames(policy)
+    valid_moves = []
+    collisions = []
+    for move in plan:
+        destination = names.reserve(move.source, move.destination)
+        if destination is None:
+            collisions.append(move)
+        else:
+            valid_moves.append(move._replace(destination=destination))
+    return valid_moves, collisions
+
+
+def execute_plan(plan, workers=1, journal=None, stats=None):
+    """
+    Applies a move plan.  Each target directory is created just once (see move_files)
+
+    Parameters:
+    ---
+    plan: list
+        List of Move
+    workers: int
+        Number of threads to move the files with (default 1 => serial)
+    journal: MoveJournal
+        Journal to record the planned & the completed moves in (default None => no journal)
+    stats: CleanStats
+        Metrics to record the time of the phases & the moved/errored files in (default None)
+    """
+    on_moved = None
+    if journal:
+        journal.record_plan(plan)
+        on_moved = journal.record_done
+    move_files([(move.source, move.destination)
+                for move in plan], workers, on_moved, stats)
+
+
+def print_plan(plan, collisions=None, exceptional_files=None):
+    """
+    Displays a move plan
+
+    Parameters:
+    ---
+    plan: list
+        List of Move
+    collisions: list
+        List of Move that are skipped because of a colliding destination
+    exceptional_files: dict
+        Files with an unknown file type (file_type => files)
+    """
+    for move in plan:
+        print(f"[{move.reason}] {move.source} => {move.destination}")
+    for move in collisions or []:
+        print(f"[SKIPPED - collision] {move.source} => {move.destination}")
+    for ext, files in (exceptional_files or {}).items():
+        for file in files:
+            print(f"[UNKNOWN - {ext}] {file}")
+    print(f"{len(plan)} file(s) to move, {len(collisions or [])} collision(s), "
+          f"{sum(len(files) for files in (exceptional_files or {}).values())} unknown file(s)")
+
+
+def write_plan(plan, plan_file):
+    """
+    Serializes a move plan to a file (JSON Lines, one move per line)
+
+    Parameters:
+    ---
+    plan: list
+        List of Move
+    plan_file: str
+        Path of the file to write the plan into
+    """
+    with open(plan_file, 'w') as fp:
+        for move in plan:
+            fp.write(json.dumps(move._asdict()) + '\n')
+
+
+def load_classification_table(config_json_path, user_config_file, stats=None):
     """
-    Performs Folder Cleaning Operation
+    Returns the compiled classification table of the APP Generated FileTypes & User Config FileTypes
+    (see classification_cache.load_classification_table)
+
+    Parameters:
+    ---
+    config_json_path: str
+        Path of the JSON File that contains the details of all the possible file types.
+    user_config_file: str
+        Path of the user_config JSON file
+    stats: CleanStats
+        Metrics to record the time of loading in (default None)
+    """
+    with clean_stats.timer(stats, clean_stats.PHASE_CONFIG_LOAD):
+        return classification_cache.load_classification_table(
+            config_json_path, user_config_file)
+
+
+def clean_folder(config_json_path, user_config_file, folder_to_clean, log=False, recursive=False, max_depth=None,
+                 workers=1, dry_run=False, plan_file=None, journal_file=None, manifest_file=None, target_root=None,
+                 sniff=False, dedupe=None, collision_policy=destination_names.POLICY_RENAME, metrics_file=None,
+                 unknown_policy=None):
+    """
+    Performs Folder Cleaning Operation and Returns the metrics of the cleaning (CleanStats)
+
+    The files are classified into a move plan first (plan_file_moves) and then the plan is applied (execute_plan).
 
     Parameters:
     ---
@@ -279,83 +846,223 @@ def clean_folder(config_json_path, user_config_file, folder_to_clean, log=False)
         Path of folder to be cleaned
     log: bool
         Diplay Spinner with the corresponding log message when doing the corresponding operation (default False)
+    recursive: bool
+        Clean the files of the sub-directories too (into the category folders of folder_to_clean).
+        Category folders created by the cleaner are never scanned (default False)
+    max_depth: int
+        Maximum depth of the sub-directories to clean, when recursive is True.  None for no limit (default None)
+    workers: int
+        Number of threads to move the files with (default 1 => serial)
+    dry_run: bool
+        Just display the move plan, without moving any file (default False)
+    plan_file: str
+        Path of the file to serialize the move plan into (JSON Lines).  None to not serialize (default None)
+    journal_file: str
+        Path of the journal to record the moves in, to resume/undo the cleaning later (see move_journal).
+        None for no journal (default None)
+    manifest_file: str
+        Path of the manifest (SQLite) of the scanned directories, to skip the directories unchanged since the
+        previous cleaning (see directory_manifest).  None to scan every directory (default None)
+    target_root: str
+        Path of the folder to create the category folders in (may be on another filesystem).
+        None to create them in the folder_to_clean (default None)
+    sniff: bool
+        Detect the file type of the files with no/unknown extension from their content (default False)
+    dedupe: str
+        Action to take for the duplicate files (see file_deduper), one of
+            report => Display the duplicate files
+            hardlink => Replace the duplicate files with hard links to their original file
+            move => Move the duplicate files into the Duplicates folder
+        None to not look for the duplicate files (default None)
+    collision_policy: str
+        What to do when the destination of a file exists already, one of destination_names.POLICIES (default rename)
+    metrics_file: str
+        Path of the file to write the metrics into (Prometheus textfile if it ends with .prom, else JSON).
+        None to not write (default None)
+    unknown_policy: unknown_types.UnknownTypesPolicy
+        What to do with the files with an unknown file type, without asking the end-user.
+        None to ask the end-user (default None)
     """
+    target_root = target_root or folder_to_clean
+    stats = clean_stats.CleanStats(folder_to_clean)
+
+    # Loading the User Config FileTypes JSON Data
+    if not exists(user_config_file):
+        utils.create_file(user_config_file, '{}')
+
+    # The classification table is loaded just before the first classification, so that a run with nothing to clean
+    # never loads the configs.  Only walking the sub-directories needs it upfront (to skip the category folders)
+    table = None
+    skip_dirs = None
+    if recursive or manifest_file:
+        table = load_classification_table(
+            config_json_path, user_config_file, stats)
+        skip_dirs = table['category_dirs']
+        if dedupe == file_deduper.ACTION_MOVE:
+            skip_dirs = skip_dirs | {file_deduper.DUPLICATES_DIR}
+        if unknown_policy is not None and unknown_policy.policy == unknown_types.POLICY_UNSORTED:
+            skip_dirs = skip_dirs | {unknown_types.UNSORTED_DIR}
+
+    # Loading the manifest of the previous cleanings (dropped, if the configs changed since then)
+    manifest = None
+    if manifest_file:
+        # The optional features are imported when used, a run with nothing to clean doesn't load them
+        import directory_manifest
+        manifest = directory_manifest.DirectoryManifest(manifest_file, classification_cache.get_sources_signature(
+            config_json_path, user_config_file))
 
     # Starting Directory Scanning Spinner
     spnr = utils.start_spinner(log, msg=fcc.MSG_DIR_SCAN)
 
-    # Getting all files from the directory to be scanned
-    files = scan_directory(folder_to_clean)
+    # Getting all files from the directory to be scanned & Classifying them into a move plan.
+    # The files are classified while the tree is walked, the time spent walking is counted in the scan phase
+    files = stats.timed(clean_stats.PHASE_SCAN, get_files_to_clean(
+        folder_to_clean, recursive, max_depth, skip_dirs, manifest))
+    first_file = next(files, None)
+    if first_file is None and manifest is None:
+        utils.stop_spinner(spnr, msg=fcc.MSG_DIR_SCANNED)
+        if metrics_file:
+            stats.write(metrics_file)
+        return stats
+    files = itertools.chain([] if first_file is None else [first_file], files)
+    if table is None:
+        table = load_classification_table(
+            config_json_path, user_config_file, stats)
+
+    duplicates = []
+    duplicate_moves = []
+    if dedupe:
+        # Finding the duplicates needs all the files
+        files = list(files)
+        with stats.timer(clean_stats.PHASE_DEDUPE):
+            duplicates = file_deduper.find_duplicates(files, max(4, workers))
+        if dedupe == file_deduper.ACTION_MOVE:
+            # Duplicate files are moved into the Duplicates folder instead of their category folder
+            duplicate_moves = file_deduper.get_duplicate_moves(
+                duplicates, target_root)
+            moved = {move.source for move in duplicate_moves}
+            files = [file for file in files if file not in moved]
+    with stats.timer(clean_stats.PHASE_CLASSIFY):
+        sniffer = None
+        if sniff:
+            import content_sniffer
+            sniffer = content_sniffer.ContentSniffer()
+        plan, exceptional_files = plan_file_moves(
+            table, files, target_root, sniffer)
+        plan, collisions = find_plan_collisions(
+            duplicate_moves + plan, collision_policy)
+    stats.add(files_skipped=len(collisions), files_unknown=sum(
+        len(unknown_files) for unknown_files in exceptional_files.values()))
 
     # Stopping Directory Scanning Spinner
     utils.stop_spinner(spnr, msg=fcc.MSG_DIR_SCANNED)
 
-    # Loading the User Config FileTypes JSON Data
-    if not exists(user_config_file):
-        utils.create_file(user_config_file, '{}')
-    user_config = utils.load_json(user_config_file)
-    user_types = get_user_file_types(user_config_file)
+    if plan_file:
+        write_plan(plan, plan_file)
 
-    # Loading the APP Generated FileTypes JSON Data
-    file_type_info = utils.load_json(config_json_path)
+    if duplicates:
+        file_deduper.print_duplicates(duplicates)
 
-    # Starting Folder Cleaner Spinner
-    spnr = utils.start_spinner(log, msg=fcc.MSG_FILE_MOVE)
+    if dry_run:
+        print_plan(plan, collisions, exceptional_files)
+        if metrics_file:
+            stats.write(metrics_file)
+        return stats
 
-    # Move Files using user config
-    move_files_user_config(user_config, files)
+    if dedupe == file_deduper.ACTION_HARDLINK:
+        # Duplicate files are linked before moving, the links are moved like any other file
+        freed = file_deduper.hardlink_duplicates(duplicates)
+        print(f"{freed} byte(s) freed by hard linking the duplicate files")
 
-    # Filtering files
-    files = filter(lambda file: get_extension(file)[1:] not in user_types,
-                   files
-                   )
+    # Starting Folder Cleaner Spinner (with the progress of the moves)
+    spnr = utils.start_spinner(log, msg=fcc.MSG_FILE_MOVE, total=len(plan),
+                               get_done=lambda: stats.files_moved + stats.files_errored)
 
-    exceptional_files = {}
-    # Looping over the files
-    for file in files:
-        # Getting the File Extension and removing . (E.g. .mp4 => mp4)
-        ext = get_extension(file)[1:].lower()
-        file_path = []
+    import move_journal
+    with move_journal.open_journal(journal_file) as journal:
+        # Moving the files (each target directory is created once)
+        execute_plan(plan, workers, journal, stats)
 
-        user_file_path = user_config.get(ext.lower())
-        if user_file_path:
-            new_dir = folder_to_clean
-            if not user_file_path == usc.PARENT:
-                new_dir = join(folder_to_clean, user_file_path)
-                new_file = join(new_dir, basename(file))
-                create_directory(new_dir)
-                move_file(file, new_file)
-        # Getting the Path of the file based on it's extension (ext)
-        elif get_file_path(file_type_info, ext, file_path):
-            # Reversing the list of path to get the correct path
-            file_path = file_path[::-1]
-            new_dir = join(folder_to_clean, '\\'.join(file_path))
-            new_file = join(new_dir, basename(file))
-            create_directory(new_dir)
-            move_file(file, new_file)
-        else:
-            map_file_to_file_type(exceptional_files, ext, file)
+        # Stopping Folder Cleaner Spinner
+        utils.stop_spinner(spnr, msg=fcc.MSG_FILE_MOVED)
+
+        # Colliding files are left in place
+        for move in collisions:
+            print(
+                f"[SKIPPED - collision] {move.source} => {move.destination}")
 
-    # Stopping Folder Cleaner Spinner
-    utils.stop_spinner(spnr, msg=fcc.MSG_FILE_MOVED)
+        move_exceptional_files(exceptional_files, user_config_file,
+                               target_root, log, workers, journal, collision_policy, stats, unknown_policy)
 
+    # Storing the scanned directories (with their mtime after the cleaning) for the next cleaning
+    if manifest is not None:
+        manifest.save(skip_dirs)
+        manifest.print_summary()
+
+    if metrics_file:
+        stats.write(metrics_file)
+    return stats
+
+
+def move_exceptional_files(exceptional_files: dict, user_config_file, folder_to_clean, log=False, workers=1,
+                           journal=None, collision_policy=destination_names.POLICY_RENAME, stats=None, unknown_policy=None):
+    """
+    Let's the end-user to set a path for the exceptional file types and moves the exceptional files using the updated user config
+    (or resolves them using the unknown_policy, without asking the end-user)
+
+    Parameters:
+    ---
+    exceptional_files: dict
+        Files with an unknown file type (file_type => files)
+    user_config_file: str
+        Path of the user_config JSON file
+    folder_to_clean: str
+        Path of folder to be cleaned
+    log: bool
+        Diplay Spinner with the corresponding log message when doing the corresponding operation (default False)
+    workers: int
+        Number of threads to move the files with (default 1 => serial)
+    journal: MoveJournal
+        Journal to record the moves in (default None => no journal)
+    collision_policy: str
+        What to do when the destination of a file exists already, one of destination_names.POLICIES (default rename)
+    stats: CleanStats
+        Metrics to record the moved/skipped files in (default None)
+    unknown_policy: unknown_types.UnknownTypesPolicy
+        What to do with the files with an unknown file type, without asking the end-user.
+        None to ask the end-user (default None)
+    """
     exceptional_file_types = [ext for ext in exceptional_files.keys()]
 
     if len(exceptional_file_types) > 0:
-        set_path_to_user_settings(
-            exceptional_file_types,
-            user_config_file
-        )
-
-        files = [file for ext in exceptional_files.keys()
-                 for file in exceptional_files[ext]]
-
-        spnr = utils.start_spinner(log, msg=fcc.MSG_FILE_MOVE)
-        # Loading the Updated User Config
-        user_config = utils.load_json(user_config_file)
-        # Moving all the Exceptional Files
-        move_files_user_config(user_config, files)
+        if unknown_policy is not None and not unknown_policy.is_interactive:
+            spnr = utils.start_spinner(log, msg=fcc.MSG_FILE_MOVE)
+            plan = unknown_policy.resolve(exceptional_files, folder_to_clean)
+        else:
+            store = set_path_to_user_settings(
+                exceptional_file_types,
+                user_config_file
+            )
+
+            files = [file for ext in exceptional_files.keys()
+                     for file in exceptional_files[ext]]
+
+            spnr = utils.start_spinner(log, msg=fcc.MSG_FILE_MOVE)
+            # Moving all the Exceptional Files, using the updated user config (as written, without reading the file again)
+            plan = [Move(old_path, new_path, fcc.REASON_USER_CONFIG) for old_path, new_path
+                    in get_user_config_moves(store.paths, files, folder_to_clean)]
+        plan, collisions = find_plan_collisions(plan, collision_policy)
+        execute_plan(plan, workers, journal, stats)
         utils.stop_spinner(spnr, msg=fcc.MSG_FILE_MOVED)
+        if stats is not None:
+            # The resolved files are counted as moved/skipped, the rest stay unknown
+            stats.add(files_skipped=len(collisions),
+                      files_unknown=-(len(plan) + len(collisions)))
+
+        # Colliding files are left in place
+        for move in collisions:
+            print(
+                f"[SKIPPED - collision] {move.source} => {move.destination}")
 
 
 def get_user_file_types(file_path):
@@ -367,8 +1074,7 @@ def get_user_file_types(file_path):
     file_path: str
         file path of a user_config JSON File
     """
-    user_types_info = utils.load_json(file_path)
-    return [file_type.lower() for file_type in user_types_info.keys()]
+    return list(user_config_store.UserConfigStore(file_path).paths.keys())
 
 
 def map_file_to_file_type(exceptional_files: dict, file_type, file_path):
@@ -413,7 +1119,8 @@ def get_path_from_user_settings(user_config: dict, search_type):
 def set_path_to_user_settings(file_types, user_config_file_path):
     """
     Let's the end-user to set a file path for the file_types (new exceptional file_types).  
-    Updates the user_config_file with the new file_type and the path the user sets.
+    Updates the user_config_file with the new file_type and the path the user sets (a single atomic write)
+    and Returns the updated user config (UserConfigStore).
 
     Parameters:
     ---
@@ -422,7 +1129,25 @@ def set_path_to_user_settings(file_types, user_config_file_path):
     user_config_file_path: str
         Path of the user_config JSON file
     """
+    store = user_config_store.UserConfigStore(user_config_file_path)
+    # Merging the current configuration the user enters with the existing user configuration
+    store.update(ask_paths_to_user(file_types))
+    store.flush()
+    return store
+
+
+def ask_paths_to_user(file_types):
+    """
+    Let's the end-user to set a file path for the file_types and Returns the paths (file_type => path), without the skipped file_types
+
+    Parameters:
+    ---
+    file_types: list
+        List of new exceptional file_types
+    """
     path_info = {}
+    if not file_types:
+        return path_info
     print()
     print(
         f"OOPS! Unable to find path for few files types like ( {', '.join(file_types)} )"
@@ -446,12 +1171,7 @@ def set_path_to_user_settings(file_types, user_config_file_path):
                 path = usc.PARENT
             path_info[extension] = path
         print('*' * 10)
-        existing_path_info = utils.load_json(user_config_file_path)
-        # Merging the current configuration the user enters with the existing user configuration
-        updated_path_info = utils.merge_dictionaries(
-            existing_path_info, path_info)
-        # Updating the user_config file with the updated configuration
-        utils.update_json(user_config_file_path, updated_path_info)
+    return path_info
 
 
 if __name__ == '__main__':
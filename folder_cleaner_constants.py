@@ -11,6 +11,14 @@ MSG_DIR_DELETED = '✓ Deleted Directory'
 MSG_FILE_MOVE = 'Moving Files'
 MSG_FILE_MOVED = '✓ Moved Files'
 MSG_SCAN = 'Scaning Directory & Moving Files'
-MSG_SCANNED = '✓ Scanned Directory & Moving Files'
+MSG_SCANNED = '✓ Scanned Directory & Moved Files'
 MSG_SET_ENV = 'Setting up Environment'
-MSG_SET_ENV_COMPLETED = '✓ Environment Setuped Successfully'
\ No newline at end of file
+MSG_SET_ENV_COMPLETED = '✓ Environment Setuped Successfully'
+
+# Reasons of a planned move
+REASON_USER_CONFIG = 'user_config'
+REASON_FILE_TYPE = 'file_type'
+REASON_CONTENT = 'content'
+REASON_DUPLICATE = 'duplicate'
+REASON_UNSORTED = 'unsorted'
+REASON_RULE = 'rule'
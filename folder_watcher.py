@@ -0,0 +1,343 @@
+"""
+A Module to watch folders and clean the files as they land (daemon mode)
+
+Uses inotify (Linux) to get notified when a file is completely written (IN_CLOSE_WRITE) or moved into a folder (IN_MOVED_TO),
+so the watcher sleeps in the kernel when nothing happens.  Falls back to polling the folders, when inotify is not available.
+Bursts of new files are debounced and cleaned together, using the same rules as folder_cleaner.clean_folder.
+"""
+
+import ctypes
+import ctypes.util
+import os
+from os.path import exists, isfile, join
+import select
+import struct
+import time
+
+import classification_cache
+import content_sniffer
+import destination_names
+import folder_cleaner
+import utils
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_ISDIR = 0x40000000
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# struct inotify_event {int wd; uint32_t mask; uint32_t cookie; uint32_t len; char name[];}
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyWatcher():
+    """
+        Watches folders for the files which are completely written/moved into them, using inotify
+    """
+
+    def __init__(self, folders):
+        """
+        Parameters:
+        ---
+        folders: list
+            Paths of the folders to watch
+        """
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify is not available')
+        self.__fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.__fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.__folders = {}
+        for folder in folders:
+            wd = libc.inotify_add_watch(self.__fd, os.fsencode(
+                folder), IN_CLOSE_WRITE | IN_MOVED_TO)
+            if wd < 0:
+                os.close(self.__fd)
+                raise OSError(ctypes.get_errno(),
+                              f"Unable to watch the folder '{folder}'")
+            self.__folders[wd] = folder
+
+    def read(self, timeout=None):
+        """
+        Returns a list of (folder, file path) of the files that landed, waits upto the timeout (in seconds) for them
+
+        Parameters:
+        ---
+        timeout: number
+            Maximum number of seconds to wait.  None to wait until a file lands (default None)
+        """
+        readable, _, _ = select.select([self.__fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.__fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        files = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset: offset + length].rstrip(b'\0')
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # Events are lost, so all the files of the folders are reported
+                files.extend((folder, file) for folder in self.__folders.values()
+                             for file in folder_cleaner.scan_directory(folder))
+            elif not mask & IN_ISDIR and wd in self.__folders and name:
+                folder = self.__folders[wd]
+                files.append((folder, join(folder, os.fsdecode(name))))
+        return files
+
+    def read_existing(self):
+        """
+        Returns a list of (folder, file path) of the files which are already in the folders
+        """
+        return [(folder, file) for folder in self.__folders.values()
+                for file in folder_cleaner.scan_directory(folder)]
+
+    def close(self):
+        """
+        Stops watching the folders
+        """
+        os.close(self.__fd)
+
+
+class PollingWatcher():
+    """
+        Watches folders for the new files by scanning them periodically (Fallback of InotifyWatcher)
+
+        A new file is reported once its size & mtime are the same in two consecutive scans (i.e. the write is finished).
+    """
+
+    def __init__(self, folders, poll_interval=1.0):
+        """
+        Parameters:
+        ---
+        folders: list
+            Paths of the folders to watch
+        poll_interval: number
+            Number of seconds between two scans of the folders (default 1.0)
+        """
+        self.__folders = folders
+        self.__poll_interval = poll_interval
+        # file path => (size, mtime) of the previous scan
+        self.__previous = {}
+        # file path => (size, mtime) when the file was reported
+        self.__reported = {}
+        self.__last_poll = 0
+
+    def read(self, timeout=None):
+        """
+        Returns a list of (folder, file path) of the new files, waits upto the timeout (in seconds) for the next scan
+
+        Parameters:
+        ---
+        timeout: number
+            Maximum number of seconds to wait.  None to wait for the next scan (default None)
+        """
+        wait = self.__last_poll + self.__poll_interval - time.monotonic()
+        if timeout is not None and wait > timeout:
+            time.sleep(timeout)
+            return []
+        if wait > 0:
+            time.sleep(wait)
+        self.__last_poll = time.monotonic()
+
+        files = []
+        current = self.__scan()
+        for (folder, path), signature in current.items():
+            # A reported file is not reported again, unless it changes
+            if self.__previous.get(path) == signature and self.__reported.get(path) != signature:
+                files.append((folder, path))
+                self.__reported[path] = signature
+        self.__previous = {path: signature for (_, path), signature in current.items()}
+        self.__reported = {path: signature for path, signature in self.__reported.items()
+                           if path in self.__previous}
+        return files
+
+    def read_existing(self):
+        """
+        Returns a list of (folder, file path) of the files which are already in the folders.
+        They are recorded as reported, so the files left in place by their cleaning (E.g. unknown or colliding files)
+        are not reported again, unless they change
+        """
+        current = self.__scan()
+        self.__previous = {path: signature for (_, path), signature in current.items()}
+        self.__reported = dict(self.__previous)
+        self.__last_poll = time.monotonic()
+        return list(current.keys())
+
+    def __scan(self):
+        """
+        Returns the (size, mtime) of each file of the folders ((folder, file path) => (size, mtime))
+        """
+        current = {}
+        for folder in self.__folders:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        current[(folder, entry.path)] = (stat.st_size, stat.st_mtime_ns)
+        return current
+
+    def close(self):
+        """
+        Stops watching the folders
+        """
+
+
+def get_watcher(folders, poll_interval=1.0):
+    """
+    Returns an InotifyWatcher for the folders, else a PollingWatcher if inotify is not available
+
+    Parameters:
+    ---
+    folders: list
+        Paths of the folders to watch
+    poll_interval: number
+        Number of seconds between two scans of the PollingWatcher (default 1.0)
+    """
+    try:
+        return InotifyWatcher(folders)
+    except (OSError, AttributeError, TypeError):
+        return PollingWatcher(folders, poll_interval)
+
+
+def clean_files(config_json_path, user_config_file, files_by_folder: dict, workers=1, log=False, sniffer=None,
+                collision_policy=destination_names.POLICY_RENAME, unknown_policy=None):
+    """
+    Cleans the given files of the folders using the same rules as folder_cleaner.clean_folder
+
+    Files with an unknown file type are left in place (nobody is there to answer the prompt), unless an unknown types
+    policy resolves them.
+
+    Parameters:
+    ---
+    config_json_path: str
+        Path of the JSON File that contains the details of all the possible file types.
+    user_config_file: str
+        Path of the user_config JSON file
+    files_by_folder: dict
+        folder => set of files to clean
+    workers: int
+        Number of threads to move the files with (default 1 => serial)
+    log: bool
+        Display the moved/unknown files (default False)
+    sniffer: content_sniffer.ContentSniffer
+        Detects the file type of the files with no/unknown extension from their content.  None to not detect (default None)
+    collision_policy: str
+        What to do when the destination of a file exists already, one of destination_names.POLICIES (default rename)
+    unknown_policy: unknown_types.UnknownTypesPolicy
+        What to do with the files with an unknown file type.  None (or ask) to leave them in place (default None)
+    """
+    # The compiled table is reused as long as the configs are unchanged, so a config update is picked up right away
+    table = classification_cache.load_classification_table(
+        config_json_path, user_config_file)
+    for folder, files in files_by_folder.items():
+        # A failure in a folder (E.g. a file removed before it is classified) must not stop the watcher
+        try:
+            files = sorted(file for file in files if isfile(file))
+            plan, exceptional_files = folder_cleaner.plan_file_moves(
+                table, files, folder, sniffer)
+            if unknown_policy is not None and not unknown_policy.is_interactive:
+                plan += unknown_policy.resolve(exceptional_files, folder)
+            plan, collisions = folder_cleaner.find_plan_collisions(
+                plan, collision_policy)
+        except OSError as e:
+            print(f"[ERROR] {folder}: {e}")
+            continue
+        execute_plan(plan, workers)
+        if log:
+            folder_cleaner.print_plan(plan, collisions, exceptional_files)
+
+
+def execute_plan(plan, workers=1):
+    """
+    Applies a move plan (see folder_cleaner.execute_plan) and logs the moves that fail instead of raising.
+    If the plan fails, the moves which are not done yet are retried one by one, so a single failing move
+    (E.g. a vanished file or an unwritable category folder) doesn't block the others
+
+    Parameters:
+    ---
+    plan: list
+        List of Move
+    workers: int
+        Number of threads to move the files with (default 1 => serial)
+    """
+    try:
+        folder_cleaner.execute_plan(plan, workers)
+        return
+    except OSError:
+        pass
+    for move in plan:
+        if not exists(move.source):
+            continue
+        try:
+            folder_cleaner.execute_plan([move])
+        except OSError as e:
+            print(f"[ERROR] {move.source} => {move.destination}: {e}")
+
+
+def watch_folders(config_json_path, user_config_file, folders, debounce=.2, poll_interval=1.0, workers=1, log=False,
+                  sniff=False, collision_policy=destination_names.POLICY_RENAME, unknown_policy=None):
+    """
+    Watches the folders and cleans the files as they land, until interrupted (Ctrl+C)
+
+    Parameters:
+    ---
+    config_json_path: str
+        Path of the JSON File that contains the details of all the possible file types.
+    user_config_file: str
+        Path of the user_config JSON file
+    folders: list
+        Paths of the folders to watch
+    debounce: number
+        Number of seconds to wait for more files, after a file lands (default .2)
+    poll_interval: number
+        Number of seconds between two scans, when inotify is not available (default 1.0)
+    workers: int
+        Number of threads to move the files with (default 1 => serial)
+    log: bool
+        Display the moved/unknown files (default False)
+    sniff: bool
+        Detect the file type of the files with no/unknown extension from their content (default False)
+    collision_policy: str
+        What to do when the destination of a file exists already, one of destination_names.POLICIES (default rename)
+    unknown_policy: unknown_types.UnknownTypesPolicy
+        What to do with the files with an unknown file type.  None (or ask) to leave them in place (default None)
+    """
+    if not exists(user_config_file):
+        utils.create_file(user_config_file, '{}')
+
+    watcher = get_watcher(folders, poll_interval)
+    # A single sniffer for the lifetime of the watcher, so an unknown file is not read again on every burst
+    sniffer = content_sniffer.ContentSniffer() if sniff else None
+    if log:
+        print(f"Watching {', '.join(folders)} using {type(watcher).__name__} (Ctrl+C to stop)")
+
+    # Files which are already in the folders are cleaned first
+    files_by_folder = {folder: set() for folder in folders}
+    for folder, file in watcher.read_existing():
+        files_by_folder[folder].add(file)
+    clean_files(config_json_path, user_config_file,
+                files_by_folder, workers, log, sniffer, collision_policy, unknown_policy)
+    try:
+        while True:
+            files_by_folder = {}
+            # Sleeping until a file lands & then collecting the burst of files, until no file lands for the debounce period
+            landed = watcher.read()
+            while landed:
+                for folder, file in landed:
+                    files_by_folder.setdefault(folder, set()).add(file)
+                landed = watcher.read(debounce)
+            if files_by_folder:
+                clean_files(config_json_path, user_config_file,
+                            files_by_folder, workers, log, sniffer, collision_policy, unknown_policy)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
@@ -2,12 +2,143 @@
 A Module to generate/update the fileTypesConfig.json.
 
 It uses file_formats_scrapper package to generate/update the fileTypesConfig.json.
+The page can be read from a local HTML file (E.g. saved once with curl), to regenerate the JSON offline or to benchmark it.
+
+A copy of the page is cached along with its ETag / Last-Modified, so an update sends a conditional request and skips
+the parsing when the page is unchanged.  The copy is replaced only once the JSON is regenerated (or confirmed) from the
+new page, so a failed update is retried by the next one.  The JSON is rewritten only when some file types were added/removed, so the
+compiled classification table (classification_cache) is regenerated only when something actually changed.
 """
 
+import argparse
 import json
+from os.path import exists
+import time
+
 from file_formats_scrapper import FileFormatsScrapper
+from file_formats_scrapper.file_formats_scrapper import DEFAULT_PARSER
+from file_formats_scrapper.page_cache import PageCache
+import folder_cleaner
+import utils
+
+# Folder to cache the copy of the page in
+DEFAULT_CACHE_DIR = '.file_formats_cache'
+
+
+def get_category_types(file_type_info):
+    """
+    Returns the file types of each category (category path joined by / => set of file types)
+
+    Parameters:
+    ---
+    file_type_info: dict
+        Parsed JSON Object that contains the details of all the possible file types
+    """
+    category_types = {}
+    for file_type, paths in folder_cleaner.build_file_type_index(file_type_info).items():
+        for path in paths:
+            category_types.setdefault('/'.join(path), set()).add(file_type)
+    return category_types
+
+
+def diff_configs(old_file_type_info, new_file_type_info):
+    """
+    Returns the file types added/removed in each category (category => {'added': [...], 'removed': [...]}),
+    only for the categories that changed
+
+    Parameters:
+    ---
+    old_file_type_info: dict
+        Current file types config
+    new_file_type_info: dict
+        Generated file types config
+    """
+    old_types = get_category_types(old_file_type_info)
+    new_types = get_category_types(new_file_type_info)
+    diff = {}
+    for category in sorted(old_types.keys() | new_types.keys()):
+        added = new_types.get(category, set()) - old_types.get(category, set())
+        removed = old_types.get(category, set()) - new_types.get(category, set())
+        if added or removed:
+            diff[category] = {'added': sorted(added), 'removed': sorted(removed)}
+    return diff
+
+
+def print_diff(diff):
+    """
+    Displays the file types added/removed in each category
+
+    Parameters:
+    ---
+    diff: dict
+        Diff returned by diff_configs
+    """
+    for category, changes in diff.items():
+        print(category)
+        for file_type in changes['added']:
+            print(f"    + {file_type}")
+        for file_type in changes['removed']:
+            print(f"    - {file_type}")
+
+
+def parse_args():
+    """
+    Parses the command line arguments of the updater
+    """
+    parser = argparse.ArgumentParser(
+        description='Generates the fileTypesConfig.json from the Wikipedia list of file formats.')
+    parser.add_argument('--html', default=None,
+                        help='Local HTML file of the page to read instead of the URL (default the cached page of --url)')
+    parser.add_argument('--url', default=FileFormatsScrapper.URL,
+                        help='URL of the page (default the Wikipedia list of file formats)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f'Folder to cache the copy of the page in (default {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--force', action='store_true',
+                        help='Parse the page, even if it is unchanged since the last update')
+    parser.add_argument('--parser', default=DEFAULT_PARSER,
+                        help=f'Parser of BeautifulSoup, E.g. lxml or html.parser (default {DEFAULT_PARSER})')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='Number of processes to parse the top-level sections of the page with (default 1)')
+    parser.add_argument('-o', '--output', default='fileTypesConfig.json',
+                        help='JSON file to write (default fileTypesConfig.json)')
+    parser.add_argument('--time', action='store_true',
+                        help='Display the time taken to fetch & parse the page and to scrap it')
+    return parser.parse_args()
+
 
 if __name__ == '__main__':
-    with open('fileTypesConfig.json', 'w') as fp:
-        # json.dump(FileFormatsScrapper().scrap_file_formats(), fp, indent=4)
-        json.dump(FileFormatsScrapper().scrap(True), fp, indent=4)
+    args = parse_args()
+    start = time.perf_counter()
+    page_cache = None
+    if args.html:
+        source, changed = args.html, True
+    else:
+        page_cache = PageCache(args.cache_dir)
+        source, changed = page_cache.fetch(args.url)
+
+    if not changed and not args.force and exists(args.output):
+        print(f"The page is unchanged, {args.output} is up to date")
+    else:
+        fetched_at = time.perf_counter()
+        scrapper = FileFormatsScrapper(source, args.parser)
+        parsed_at = time.perf_counter()
+        file_types = scrapper.scrap(not args.time, args.workers)
+        scrapped_at = time.perf_counter()
+
+        old_file_types = utils.load_json(args.output) if exists(args.output) else {}
+        diff = diff_configs(old_file_types, file_types)
+        if diff or not exists(args.output):
+            print_diff(diff)
+            with open(args.output, 'w') as fp:
+                json.dump(file_types, fp, indent=4)
+        else:
+            print(f"No file types were added/removed, {args.output} is left untouched")
+
+        if args.time:
+            print(f"fetch took {fetched_at - start:.6f} sec")
+            print(f"parse took {parsed_at - fetched_at:.6f} sec")
+            print(f"scrap took {scrapped_at - parsed_at:.6f} sec")
+
+    # The JSON is up to date with the fetched page (not reached, if the parsing or the write failed)
+    if page_cache is not None:
+        page_cache.save()
@@ -0,0 +1,291 @@
+"""
+A Module to record the moves of a cleaning in an append-only journal, to resume an interrupted cleaning & to undo a cleaning
+
+The journal is a JSON Lines file with one record per line
+    {"op": "plan", "source": ..., "destination": ..., "reason": ...} => A planned move
+    {"op": "done", "source": ..., "destination": ...} => A completed move
+    {"op": "undone", "source": ..., "destination": ...} => A completed move which is reverted by undo
+
+Planned moves are synced to the disk before any file is moved.  Completed moves are written in batches and synced periodically,
+so the journal costs just a few writes for thousands of moves.  A completed move whose record is lost in a crash
+is still detected on resume & undo (the source is gone & the destination exists).
+When a file is planned more than once (E.g. resume renamed its destination), its latest plan wins.
+"""
+
+from contextlib import contextmanager
+import json
+import os
+from os.path import dirname, exists
+import threading
+import time
+
+import destination_names
+import folder_cleaner
+import folder_cleaner_constants as fcc
+import utils
+
+OP_PLAN = 'plan'
+OP_DONE = 'done'
+OP_UNDONE = 'undone'
+
+
+class MoveJournal():
+    """
+        Append-only journal of the planned & the completed moves (thread-safe)
+    """
+
+    def __init__(self, journal_path, batch_size=512, fsync_interval=1.0):
+        """
+        Parameters:
+        ---
+        journal_path: str
+            Path of the journal file (created if not exists, else appended)
+        batch_size: int
+            Number of records to buffer before writing them to the journal file (default 512)
+        fsync_interval: number
+            Minimum number of seconds between two syncs of the journal file to the disk (default 1.0)
+        """
+        self.__file = open(journal_path, 'a')
+        self.__batch_size = batch_size
+        self.__fsync_interval = fsync_interval
+        self.__last_fsync = time.monotonic()
+        self.__records = []
+        self.__lock = threading.Lock()
+
+    def __append(self, op, source, destination, **kwargs):
+        """
+        Buffers a record and writes the buffered records, if the batch is full
+        """
+        record = json.dumps(
+            {'op': op, 'source': source, 'destination': destination, **kwargs})
+        with self.__lock:
+            self.__records.append(record)
+            if len(self.__records) >= self.__batch_size:
+                self.__write(fsync=time.monotonic() -
+                             self.__last_fsync >= self.__fsync_interval)
+
+    def __write(self, fsync=False):
+        """
+        Writes the buffered records to the journal file (Caller must hold the lock)
+        """
+        if self.__records:
+            self.__file.write('\n'.join(self.__records) + '\n')
+            self.__records = []
+        self.__file.flush()
+        if fsync:
+            os.fsync(self.__file.fileno())
+            self.__last_fsync = time.monotonic()
+
+    def record_plan(self, plan):
+        """
+        Records the planned moves and syncs them to the disk
+
+        Parameters:
+        ---
+        plan: list
+            List of folder_cleaner.Move
+        """
+        for move in plan:
+            self.__append(OP_PLAN, move.source,
+                          move.destination, reason=move.reason)
+        self.flush(fsync=True)
+
+    def record_done(self, source, destination):
+        """
+        Records a completed move
+
+        Parameters:
+        ---
+        source: str
+            Path from where the file is moved
+        destination: str
+            Path to where the file is moved
+        """
+        self.__append(OP_DONE, source, destination)
+
+    def record_undone(self, source, destination):
+        """
+        Records a reverted move
+
+        Parameters:
+        ---
+        source: str
+            Original path of the file (where it is moved back)
+        destination: str
+            Path from where the file is moved back
+        """
+        self.__append(OP_UNDONE, source, destination)
+
+    def flush(self, fsync=False):
+        """
+        Writes all the buffered records to the journal file
+
+        Parameters:
+        ---
+        fsync: bool
+            Sync the journal file to the disk too (default False)
+        """
+        with self.__lock:
+            self.__write(fsync)
+
+    def close(self):
+        """
+        Writes all the buffered records, syncs & closes the journal file
+        """
+        self.flush(fsync=True)
+        self.__file.close()
+
+
+@contextmanager
+def open_journal(journal_path):
+    """
+    Context Manager that yields a MoveJournal for the journal_path (None, if journal_path is None) and closes it on exit
+
+    Parameters:
+    ---
+    journal_path: str
+        Path of the journal file
+    """
+    if not journal_path:
+        yield None
+        return
+    journal = MoveJournal(journal_path)
+    try:
+        yield journal
+    finally:
+        journal.close()
+
+
+def read_journal(journal_path):
+    """
+    Returns the planned moves (list of folder_cleaner.Move, the latest plan of each file), the completed moves
+    (list of (source, destination)) and the reverted moves (set of (source, destination)) of a journal
+
+    A partially written last record (E.g. due to a crash) is ignored.
+
+    Parameters:
+    ---
+    journal_path: str
+        Path of the journal file
+    """
+    # source => latest planned move of the file (in the order of the latest plans)
+    planned = {}
+    done = []
+    undone = set()
+    with open(journal_path) as fp:
+        for line in fp:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            key = (record['source'], record['destination'])
+            if record['op'] == OP_PLAN:
+                planned.pop(record['source'], None)
+                planned[record['source']] = folder_cleaner.Move(
+                    record['source'], record['destination'], record.get('reason'))
+            elif record['op'] == OP_DONE:
+                done.append(key)
+            elif record['op'] == OP_UNDONE:
+                undone.add(key)
+    return list(planned.values()), done, undone
+
+
+def is_move_done(source, destination):
+    """
+    Returns True if a move looks completed (the source is gone & the destination exists), even if its record was lost
+
+    Parameters:
+    ---
+    source: str
+        Path from where the file is moved
+    destination: str
+        Path to where the file is moved
+    """
+    return not exists(source) and exists(destination)
+
+
+def get_pending_moves(journal_path):
+    """
+    Returns the planned moves of a journal which are not completed yet
+
+    Parameters:
+    ---
+    journal_path: str
+        Path of the journal file
+    """
+    planned, done, _ = read_journal(journal_path)
+    done = set(done)
+    pending = []
+    for move in planned:
+        if (move.source, move.destination) in done:
+            continue
+        # Completed, but the record was lost (E.g. a crash before the batch was written)
+        if is_move_done(move.source, move.destination):
+            continue
+        pending.append(move)
+    return pending
+
+
+def resume_moves(journal_path, workers=1, log=False, collision_policy=destination_names.POLICY_RENAME):
+    """
+    Completes the pending moves of an interrupted cleaning, without scanning the folder again and Returns the completed moves
+
+    A destination may have been taken by another file since the crash, so the collisions are resolved again (never overwritten)
+
+    Parameters:
+    ---
+    journal_path: str
+        Path of the journal file
+    workers: int
+        Number of threads to move the files with (default 1 => serial)
+    log: bool
+        Diplay Spinner with the corresponding log message when doing the corresponding operation (default False)
+    collision_policy: str
+        What to do when the destination of a file exists already, one of destination_names.POLICIES (default rename)
+    """
+    pending = [move for move in get_pending_moves(journal_path)
+               if exists(move.source)]
+    plan, collisions = folder_cleaner.find_plan_collisions(
+        pending, collision_policy)
+
+    spnr = utils.start_spinner(log, msg=fcc.MSG_FILE_MOVE)
+    with open_journal(journal_path) as journal:
+        # The plan is recorded again, as the destination of a renamed move differs from its journaled destination
+        folder_cleaner.execute_plan(plan, workers, journal)
+    utils.stop_spinner(spnr, msg=fcc.MSG_FILE_MOVED)
+
+    # Colliding files are left in place
+    for move in collisions:
+        print(f"[SKIPPED - collision] {move.source} => {move.destination}")
+    return plan
+
+
+def undo_moves(journal_path, log=False):
+    """
+    Reverts the completed moves of a journal (latest move first) and Returns the list of reverted (source, destination)
+
+    The planned moves are walked (and not just the completed records), so a completed move whose record was lost
+    in a crash is reverted too.
+
+    Parameters:
+    ---
+    journal_path: str
+        Path of the journal file
+    log: bool
+        Diplay Spinner with the corresponding log message when doing the corresponding operation (default False)
+    """
+    planned, _, undone = read_journal(journal_path)
+    reverted = []
+
+    spnr = utils.start_spinner(log, msg=fcc.MSG_FILE_MOVE)
+    with open_journal(journal_path) as journal:
+        for source, destination, _ in reversed(planned):
+            if (source, destination) in undone or not is_move_done(source, destination):
+                continue
+            if dirname(source):
+                folder_cleaner.create_directory(dirname(source))
+            folder_cleaner.move_file(destination, source)
+            journal.record_undone(source, destination)
+            reverted.append((source, destination))
+    utils.stop_spinner(spnr, msg=fcc.MSG_FILE_MOVED)
+    return reverted
@@ -0,0 +1,233 @@
+"""
+A Module to clean many folders (roots) in parallel, using a pool of processes
+
+Each worker process loads the classification table once (from the compiled cache) and reuses it for all the roots it cleans.
+Files with an unknown file type are collected from all the roots, so that the end-user is asked just once at the end
+(or resolved by an unknown types policy, without asking).
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+from os.path import exists
+
+import classification_cache
+import destination_names
+import folder_cleaner
+import folder_cleaner_constants as fcc
+import utils
+
+# Classification table of a worker process (loaded once by init_worker)
+worker_table = None
+
+
+def get_roots(directories, each_child=False):
+    """
+    Returns a list of roots (folders) to clean
+
+    Parameters:
+    ---
+    directories: list
+        Paths of the folders to clean
+    each_child: bool
+        Treat each child directory of the directories as an independent root (default False)
+    """
+    if not each_child:
+        return list(directories)
+
+    roots = []
+    for directory in directories:
+        with os.scandir(directory) as entries:
+            roots.extend(sorted(entry.path for entry in entries
+                                if entry.is_dir(follow_symlinks=False)))
+    return roots
+
+
+def init_worker(config_json_path, user_config_file):
+    """
+    Loads the classification table of a worker process
+
+    Parameters:
+    ---
+    config_json_path: str
+        Path of the JSON File that contains the details of all the possible file types.
+    user_config_file: str
+        Path of the user_config JSON file
+    """
+    global worker_table
+    worker_table = classification_cache.load_classification_table(
+        config_json_path, user_config_file)
+
+
+def clean_root(root, recursive=False, max_depth=None, workers=1, collision_policy=destination_names.POLICY_RENAME):
+    """
+    Cleans a single root using the classification table of the worker process and Returns a summary dictionary
+
+    Summary dictionary has the following keys
+        root => Path of the root
+        moved => Number of files moved
+        collisions => Number of files skipped because of a colliding destination
+        exceptional_files => Files with an unknown file type (file_type => files)
+        unknown => Number of files with an unknown file type, which are left in place
+        error => Error message if the cleaning failed, else None
+
+    Parameters:
+    ---
+    root: str
+        Path of folder to be cleaned
+    recursive: bool
+        Clean the files of the sub-directories too (default False)
+    max_depth: int
+        Maximum depth of the sub-directories to clean, when recursive is True.  None for no limit (default None)
+    workers: int
+        Number of threads to move the files with (default 1 => serial)
+    collision_policy: str
+        What to do when the destination of a file exists already, one of destination_names.POLICIES (default rename)
+    """
+    summary = {'root': root, 'moved': 0, 'collisions': 0,
+               'exceptional_files': {}, 'unknown': 0, 'error': None}
+    # Moved files are counted one by one, so a failure in the middle of the moves still reports the files moved before it
+    moved = []
+    try:
+        files = folder_cleaner.get_files_to_clean(
+            root, recursive, max_depth, worker_table['category_dirs'])
+        plan, exceptional_files = folder_cleaner.plan_file_moves(
+            worker_table, files, root)
+        plan, collisions = folder_cleaner.find_plan_collisions(
+            plan, collision_policy)
+        # Recorded before moving, so the unknown files still reach the prompt/policy if a move fails
+        summary.update(collisions=len(collisions), exceptional_files=exceptional_files,
+                       unknown=sum(len(files) for files in exceptional_files.values()))
+        folder_cleaner.move_files([(move.source, move.destination) for move in plan], workers,
+                                  lambda old_path, new_path: moved.append(old_path))
+    except OSError as e:
+        summary['error'] = str(e)
+    summary['moved'] = len(moved)
+    return summary
+
+
+def print_collisions(collisions):
+    """
+    Displays the colliding moves, which are skipped (the files are left in place)
+
+    Parameters:
+    ---
+    collisions: list
+        List of folder_cleaner.Move
+    """
+    for move in collisions:
+        print(f"[SKIPPED - collision] {move.source} => {move.destination}")
+
+
+def add_resolved_files(summary, plan, collisions):
+    """
+    Counts the files with an unknown file type, which are resolved by the policy/end-user, in the summary of a root
+
+    Parameters:
+    ---
+    summary: dict
+        Summary of the root (returned by clean_root)
+    plan: list
+        Moves of the resolved files, which are done (list of folder_cleaner.Move)
+    collisions: list
+        Colliding moves of the resolved files, which are skipped (list of folder_cleaner.Move)
+    """
+    summary['moved'] += len(plan)
+    summary['collisions'] += len(collisions)
+    summary['unknown'] -= len(plan) + len(collisions)
+
+
+def print_summaries(summaries):
+    """
+    Displays the summary of each root along with the aggregated summary
+
+    Parameters:
+    ---
+    summaries: list
+        List of summary dictionaries (returned by clean_root)
+    """
+    print()
+    for summary in summaries:
+        if summary['error']:
+            print(f"{summary['root']}: FAILED - {summary['error']}")
+            continue
+        print(f"{summary['root']}: {summary['moved']} moved, "
+              f"{summary['collisions']} collision(s), {summary['unknown']} unknown")
+    print('*' * 20)
+    print(f"{len(summaries)} root(s), "
+          f"{sum(summary['moved'] for summary in summaries)} file(s) moved, "
+          f"{sum(1 for summary in summaries if summary['error'])} failed")
+
+
+def clean_folders(config_json_path, user_config_file, roots, log=False, recursive=False, max_depth=None,
+                  processes=None, workers=1, collision_policy=destination_names.POLICY_RENAME, unknown_policy=None):
+    """
+    Performs Folder Cleaning Operation for many roots in parallel and Returns a list of summary dictionaries (see clean_root)
+
+    Parameters:
+    ---
+    config_json_path: str
+        Path of the JSON File that contains the details of all the possible file types.
+    user_config_file: str
+        Path of the user_config JSON file
+    roots: list
+        Paths of the folders to be cleaned
+    log: bool
+        Diplay Spinner with the corresponding log message when doing the corresponding operation (default False)
+    recursive: bool
+        Clean the files of the sub-directories too (default False)
+    max_depth: int
+        Maximum depth of the sub-directories to clean, when recursive is True.  None for no limit (default None)
+    processes: int
+        Number of worker processes (default None => number of CPUs)
+    workers: int
+        Number of threads (per process) to move the files with (default 1 => serial)
+    collision_policy: str
+        What to do when the destination of a file exists already, one of destination_names.POLICIES (default rename)
+    unknown_policy: unknown_types.UnknownTypesPolicy
+        What to do with the files with an unknown file type, without asking the end-user.
+        None to ask the end-user (default None)
+    """
+    if not exists(user_config_file):
+        utils.create_file(user_config_file, '{}')
+
+    # Compiling the classification table once, so that every worker just reads the cache
+    classification_cache.load_classification_table(
+        config_json_path, user_config_file)
+
+    spnr = utils.start_spinner(log, msg=fcc.MSG_SCAN)
+    with ProcessPoolExecutor(max_workers=processes, initializer=init_worker,
+                             initargs=(config_json_path, user_config_file)) as executor:
+        summaries = list(executor.map(
+            clean_root, roots,
+            [recursive] * len(roots), [max_depth] * len(roots), [workers] * len(roots),
+            [collision_policy] * len(roots)))
+    utils.stop_spinner(spnr, msg=fcc.MSG_SCANNED)
+
+    if unknown_policy is not None and not unknown_policy.is_interactive:
+        for summary in summaries:
+            plan = unknown_policy.resolve(
+                summary['exceptional_files'], summary['root'])
+            plan, collisions = folder_cleaner.find_plan_collisions(
+                plan, collision_policy)
+            folder_cleaner.execute_plan(plan, workers)
+            add_resolved_files(summary, plan, collisions)
+            print_collisions(collisions)
+    else:
+        # Asking the end-user just once for the unknown file types of all the roots
+        exceptional_file_types = sorted({ext for summary in summaries
+                                         for ext in summary['exceptional_files'].keys()})
+        if len(exceptional_file_types) > 0:
+            user_paths = folder_cleaner.set_path_to_user_settings(
+                exceptional_file_types, user_config_file).paths
+            for summary in summaries:
+                files = [file for files in summary['exceptional_files'].values()
+                         for file in files]
+                plan, collisions = folder_cleaner.move_files_user_config(
+                    user_paths, files, summary['root'], workers, collision_policy)
+                add_resolved_files(summary, plan, collisions)
+                print_collisions(collisions)
+
+    # Displayed once the unknown files are resolved, so the summary counts their moves too
+    if log:
+        print_summaries(summaries)
+    return summaries
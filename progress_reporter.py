@@ -0,0 +1,134 @@
+"""
+A Module to display the progress of a long running phase (files processed, rate & ETA) from a background thread
+
+Replaces the spinner process of the spinner package: a thread is started instead of a process, the terminal is
+written at most every `interval` seconds, and nothing is written when the output is not a terminal (E.g. cron logs).
+"""
+
+import sys
+import threading
+import time
+
+# Cursor Symbols for all the directions
+CURSORS = '|/-\\'
+
+
+def format_seconds(seconds):
+    """
+    Returns a duration formatted as [H:]MM:SS
+
+    Parameters:
+    ---
+    seconds: number
+        Duration in seconds
+    """
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+class ProgressReporter():
+    """
+        Displays a message with a spinner and (if known) the number of files processed, the rate & the ETA
+    """
+
+    def __init__(self, msg='PROCESSING', total=None, get_done=None, interval=.2, stream=None):
+        """
+        Parameters:
+        ---
+        msg: str
+            Message to display
+        total: int
+            Total number of files of the phase, None if unknown (default None)
+        get_done: callable
+            Function that Returns the number of files processed so far.  None to count the calls of advance (default None)
+        interval: number
+            Minimum number of seconds between two writes to the terminal (default .2)
+        stream: file
+            Stream to write to (default sys.stdout)
+        """
+        self.msg = msg
+        self.total = total
+        self.done = 0
+        self.__get_done = get_done
+        self.__interval = interval
+        self.__stream = stream or sys.stdout
+        self.__enabled = self.__stream.isatty()
+        self.__started_at = time.monotonic()
+        self.__stop_event = threading.Event()
+        self.__thread = None
+        self.__width = 0
+
+    def start(self):
+        """
+        Starts displaying the progress (does nothing if the stream is not a terminal) and Returns the reporter
+        """
+        if self.__enabled and self.__thread is None:
+            self.__thread = threading.Thread(target=self.__run, daemon=True)
+            self.__thread.start()
+        return self
+
+    def advance(self, count=1):
+        """
+        Adds count to the number of files processed
+
+        Parameters:
+        ---
+        count: int
+            Number of files processed (default 1)
+        """
+        self.done += count
+
+    def __get_line(self, cursor):
+        """
+        Returns the progress line to display
+        """
+        done = self.__get_done() if self.__get_done else self.done
+        elapsed = time.monotonic() - self.__started_at
+        line = f"{self.msg} {cursor}"
+        if done or self.total:
+            rate = done / elapsed if elapsed else 0
+            line += f" {done}" + (f"/{self.total}" if self.total else '') + \
+                f" files  {rate:.0f}/s"
+            if self.total and rate:
+                line += f"  ETA {format_seconds(max(self.total - done, 0) / rate)}"
+        return line
+
+    def __write(self, line):
+        """
+        Overwrites the current line of the terminal with the line
+        """
+        self.__stream.write('\r' + line.ljust(self.__width))
+        self.__stream.flush()
+        self.__width = len(line)
+
+    def __run(self):
+        """
+        Writes the progress line until stopped (runs in the background thread)
+        """
+        index = 0
+        while not self.__stop_event.is_set():
+            self.__write(self.__get_line(CURSORS[index % len(CURSORS)]))
+            index += 1
+            self.__stop_event.wait(self.__interval)
+
+    def stop(self, msg='done'):
+        """
+        Stops displaying the progress and displays the stop message
+
+        Parameters:
+        ---
+        msg: str
+            Stop Message
+        """
+        if self.__thread is None:
+            return
+        self.__stop_event.set()
+        self.__thread.join()
+        self.__thread = None
+        done = self.__get_done() if self.__get_done else self.done
+        if done:
+            msg += f" ({done} files in {format_seconds(time.monotonic() - self.__started_at)})"
+        self.__write(msg)
+        self.__stream.write('\n')
+        self.__stream.flush()
@@ -0,0 +1,97 @@
+"""
+A Module to profile a run of the app without editing the code
+
+    cpu => cProfile, the stats are dumped into a pstats file and the top functions (by cumulative time) are displayed
+    mem => tracemalloc, the top allocation sites & the peak memory are displayed
+"""
+
+PROFILE_CPU = 'cpu'
+PROFILE_MEM = 'mem'
+PROFILES = [PROFILE_CPU, PROFILE_MEM]
+
+# Default file to dump the cProfile stats into
+DEFAULT_STATS_FILE = 'folder_cleaner.pstats'
+
+
+def profile_cpu(func, stats_file=DEFAULT_STATS_FILE, top=20):
+    """
+    Runs func under cProfile, dumps the stats into the stats_file & displays the top functions and Returns the result of func
+
+    Parameters:
+    ---
+    func: callable
+        Function to profile (no arguments)
+    stats_file: str
+        Path of the file to dump the stats into (open it with pstats / snakeviz) (default DEFAULT_STATS_FILE)
+    top: int
+        Number of functions to display (default 20)
+    """
+    # Imported lazily, as the profilers are not needed by a normal run
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func)
+    finally:
+        profiler.dump_stats(stats_file)
+        print(f"\nCPU profile dumped into {stats_file}")
+        pstats.Stats(profiler).strip_dirs().sort_stats(
+            pstats.SortKey.CUMULATIVE).print_stats(top)
+
+
+def profile_mem(func, top=20, frames=1):
+    """
+    Runs func under tracemalloc, displays the top allocation sites & the peak memory and Returns the result of func
+
+    Parameters:
+    ---
+    func: callable
+        Function to profile (no arguments)
+    top: int
+        Number of allocation sites to display (default 20)
+    frames: int
+        Number of frames to store per allocation (default 1 => just the line which allocated)
+    """
+    import tracemalloc  # Imported lazily, as the profilers are not needed by a normal run
+
+    tracemalloc.start(frames)
+    try:
+        return func()
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>')
+        ])
+        print(f"\nMemory: {current / 1024:.1f} KiB at the end, {peak / 1024:.1f} KiB at the peak")
+        print(f"Top {top} allocation sites")
+        for index, stat in enumerate(snapshot.statistics('traceback' if frames > 1 else 'lineno')[:top], 1):
+            print(f"#{index}: {stat.size / 1024:.1f} KiB in {stat.count} block(s)")
+            for line in stat.traceback.format():
+                print(f"    {line}")
+
+
+def run_profiled(profile, func, stats_file=DEFAULT_STATS_FILE, top=20):
+    """
+    Runs func under the given profile (None => without profiling) and Returns the result of func
+
+    Parameters:
+    ---
+    profile: str
+        One of PROFILES, None to not profile
+    func: callable
+        Function to run (no arguments)
+    stats_file: str
+        Path of the file to dump the cProfile stats into, for the cpu profile (default DEFAULT_STATS_FILE)
+    top: int
+        Number of functions/allocation sites to display (default 20)
+    """
+    if profile == PROFILE_CPU:
+        return profile_cpu(func, stats_file, top)
+    if profile == PROFILE_MEM:
+        return profile_mem(func, top)
+    return func()
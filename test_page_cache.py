@@ -0,0 +1,135 @@
+"""
+Tests of file_formats_scrapper.page_cache against a local stand-in of the file formats page (http.server)
+
+    python -m unittest test_page_cache
+"""
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from file_formats_scrapper.page_cache import PageCache
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    """
+        Serves the page of the server (body & ETag), answers 304 to a request with the current ETag
+    """
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        etag = self.server.etag
+        if etag and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = self.server.body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PageCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), PageHandler)
+        self.server.body = '<html>v1</html>'
+        self.server.etag = '"v1"'
+        self.server.requests = []
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/page"
+        self.cache_dir = tempfile.mkdtemp(prefix='page-cache-test-')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        shutil.rmtree(self.cache_dir)
+
+    def read(self, path):
+        with open(path, encoding='utf-8') as fp:
+            return fp.read()
+
+    def test_first_fetch_is_changed(self):
+        cache = PageCache(self.cache_dir)
+        path, changed = cache.fetch(self.url)
+        self.assertTrue(changed)
+        self.assertEqual(self.read(path), '<html>v1</html>')
+        cache.save()
+        self.assertEqual(cache.read(), '<html>v1</html>')
+
+    def test_not_modified(self):
+        cache = PageCache(self.cache_dir)
+        cache.fetch(self.url)
+        cache.save()
+
+        path, changed = cache.fetch(self.url)
+        self.assertFalse(changed)
+        self.assertEqual(path, cache.html_path)
+        self.assertEqual(self.server.requests[-1].get('If-None-Match'), '"v1"')
+
+    def test_modified(self):
+        cache = PageCache(self.cache_dir)
+        cache.fetch(self.url)
+        cache.save()
+
+        self.server.body = '<html>v2</html>'
+        self.server.etag = '"v2"'
+        path, changed = cache.fetch(self.url)
+        self.assertTrue(changed)
+        self.assertEqual(self.read(path), '<html>v2</html>')
+        # The local copy is replaced once saved
+        self.assertEqual(cache.read(), '<html>v1</html>')
+        cache.save()
+        self.assertEqual(cache.read(), '<html>v2</html>')
+
+    def test_same_body_without_validators(self):
+        self.server.etag = None
+        cache = PageCache(self.cache_dir)
+        cache.fetch(self.url)
+        cache.save()
+
+        path, changed = cache.fetch(self.url)
+        self.assertFalse(changed)
+        self.assertEqual(path, cache.html_path)
+
+        self.server.body = '<html>v2</html>'
+        _, changed = cache.fetch(self.url)
+        self.assertTrue(changed)
+
+    def test_unsaved_fetch_is_fetched_again(self):
+        cache = PageCache(self.cache_dir)
+        cache.fetch(self.url)
+        cache.save()
+
+        # E.g. the parsing of the new page failed, so save() is never called
+        self.server.body = '<html>v2</html>'
+        self.server.etag = '"v2"'
+        cache.fetch(self.url)
+
+        cache = PageCache(self.cache_dir)
+        path, changed = cache.fetch(self.url)
+        self.assertTrue(changed)
+        self.assertEqual(self.read(path), '<html>v2</html>')
+        self.assertEqual(self.server.requests[-1].get('If-None-Match'), '"v1"')
+
+    def test_save_without_fetch(self):
+        cache = PageCache(self.cache_dir)
+        cache.save()
+        self.assertIsNone(cache.read())
+        self.assertFalse(os.listdir(self.cache_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,232 @@
+"""
+A Module to handle the files with an unknown file type without asking the end-user (E.g. unattended/cron runs)
+
+    ask => The end-user is asked for a path of each unknown file type (interactive, the default)
+    leave => The files are left in place
+    unsorted => The files are moved into Unsorted/<file type> of the cleaned folder
+    defer => The files are left in place and queued into a file (JSON Lines), to resolve all of them later at once
+    rule => The files are moved using the rules of a JSON file (file name pattern => relative path), the others are left in place
+"""
+
+from fnmatch import fnmatchcase
+import json
+import os
+from os.path import basename, exists, isfile, join
+
+import destination_names
+import folder_cleaner
+import folder_cleaner_constants as fcc
+import user_config_constants as usc
+import user_config_store
+import utils
+
+POLICY_ASK = 'ask'
+POLICY_LEAVE = 'leave'
+POLICY_UNSORTED = 'unsorted'
+POLICY_DEFER = 'defer'
+POLICY_RULE = 'rule'
+POLICIES = [POLICY_ASK, POLICY_LEAVE, POLICY_UNSORTED, POLICY_DEFER, POLICY_RULE]
+
+# Folder to move the files with an unknown file type into (one sub-folder per file type)
+UNSORTED_DIR = 'Unsorted'
+# Sub-folder of UNSORTED_DIR for the files without an extension
+NO_EXTENSION_DIR = 'no_extension'
+
+# Default file to queue the deferred files into
+DEFAULT_QUEUE_FILE = 'deferredFiles.jsonl'
+
+
+def load_rules(rules_file):
+    """
+    Returns the rules of a JSON file as a list of (file name pattern, relative path), in the order of the file
+
+    Parameters:
+    ---
+    rules_file: str
+        Path of a JSON file of rules (file name pattern => relative path or PARENT).  E.g. {"*.log": "Logs", "invoice*": "Invoices"}
+    """
+    return [(pattern.lower(), path) for pattern, path in utils.load_json(rules_file).items()]
+
+
+def match_rule(rules, file):
+    """
+    Returns the relative path of the first rule that matches the name of the file, None if no rule matches
+
+    Parameters:
+    ---
+    rules: list
+        Rules returned by load_rules
+    file: str
+        Path of the file
+    """
+    name = basename(file).lower()
+    for pattern, path in rules:
+        if fnmatchcase(name, pattern):
+            return path
+
+
+def get_relative_move(file, folder_to_clean, relative_path, reason):
+    """
+    Returns a Move of the file into the relative path of the folder_to_clean, None if the file is already there
+
+    Parameters:
+    ---
+    file: str
+        Path of the file
+    folder_to_clean: str
+        Path of the cleaned folder
+    relative_path: str
+        Path relative to the folder_to_clean (PARENT => folder_to_clean itself)
+    reason: str
+        Reason of the move (one of the REASON_* constants)
+    """
+    new_dir = folder_to_clean if relative_path == usc.PARENT else join(
+        folder_to_clean, relative_path)
+    new_file = join(new_dir, basename(file))
+    if new_file != file:
+        return folder_cleaner.Move(file, new_file, reason)
+
+
+def read_queue(queue_file):
+    """
+    Returns the entries of the deferred queue (list of dictionaries with file, file_type & folder), empty if not exists
+
+    Parameters:
+    ---
+    queue_file: str
+        Path of the queue file
+    """
+    if not exists(queue_file):
+        return []
+    with open(queue_file) as fp:
+        return [json.loads(line) for line in fp if line.strip()]
+
+
+def write_queue(queue_file, entries):
+    """
+    Rewrites the deferred queue with the entries atomically
+
+    Parameters:
+    ---
+    queue_file: str
+        Path of the queue file
+    entries: list
+        Entries of the queue
+    """
+    temp_path = f"{queue_file}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as fp:
+        for entry in entries:
+            fp.write(json.dumps(entry) + '\n')
+    os.replace(temp_path, queue_file)
+
+
+class UnknownTypesPolicy():
+    """
+        Resolves the files with an unknown file type without stopping, using a policy
+    """
+
+    def __init__(self, policy=POLICY_ASK, rules_file=None, queue_file=DEFAULT_QUEUE_FILE):
+        """
+        Parameters:
+        ---
+        policy: str
+            One of POLICIES (default POLICY_ASK)
+        rules_file: str
+            Path of the JSON file of rules, needed by the rule policy (default None)
+        queue_file: str
+            Path of the file to queue the deferred files into, for the defer policy (default DEFAULT_QUEUE_FILE)
+        """
+        self.policy = policy
+        self.queue_file = queue_file
+        self.__rules = load_rules(rules_file) if rules_file else []
+
+    @property
+    def is_interactive(self):
+        """
+        True if the end-user has to be asked
+        """
+        return self.policy == POLICY_ASK
+
+    def resolve(self, exceptional_files: dict, folder_to_clean):
+        """
+        Returns the moves (list of Move) of the files with an unknown file type.
+        The deferred files are appended to the queue file (with a single write)
+
+        Parameters:
+        ---
+        exceptional_files: dict
+            Files with an unknown file type (file_type => files)
+        folder_to_clean: str
+            Path of the cleaned folder (the Unsorted folder & the paths of the rules are relative to it)
+        """
+        moves = []
+        if self.policy == POLICY_UNSORTED:
+            for file_type, files in exceptional_files.items():
+                relative_path = join(UNSORTED_DIR, file_type or NO_EXTENSION_DIR)
+                moves.extend(get_relative_move(file, folder_to_clean, relative_path, fcc.REASON_UNSORTED)
+                             for file in files)
+        elif self.policy == POLICY_RULE:
+            for files in exceptional_files.values():
+                for file in files:
+                    relative_path = match_rule(self.__rules, file)
+                    if relative_path is not None:
+                        moves.append(get_relative_move(
+                            file, folder_to_clean, relative_path, fcc.REASON_RULE))
+        elif self.policy == POLICY_DEFER and exceptional_files:
+            with open(self.queue_file, 'a') as fp:
+                fp.write(''.join(json.dumps({'file': file, 'file_type': file_type, 'folder': folder_to_clean}) + '\n'
+                                 for file_type, files in exceptional_files.items() for file in files))
+        return [move for move in moves if move is not None]
+
+
+def resolve_deferred(queue_file, user_config_file, workers=1, collision_policy=destination_names.POLICY_RENAME):
+    """
+    Asks the end-user once for a path of each file type of the deferred queue, updates the user config with a single write,
+    moves the deferred files and Returns the moved files (list of Move).
+    The files that are skipped by the end-user stay in the queue, the files that no longer exist are dropped
+
+    Parameters:
+    ---
+    queue_file: str
+        Path of the queue file
+    user_config_file: str
+        Path of the user_config JSON file
+    workers: int
+        Number of threads to move the files with (default 1 => serial)
+    collision_policy: str
+        What to do when the destination of a file exists already, one of destination_names.POLICIES (default rename)
+    """
+    # Dropping the files which were moved/deleted since they were queued (& the files queued twice)
+    entries = list({entry['file']: entry for entry in read_queue(queue_file)
+                    if isfile(entry['file'])}.values())
+    file_types = sorted({entry['file_type'] for entry in entries})
+    if not file_types:
+        write_queue(queue_file, [])
+        return []
+
+    store = user_config_store.UserConfigStore(user_config_file)
+    unresolved = [file_type for file_type in file_types
+                  if store.get(file_type) is None]
+    store.update(folder_cleaner.ask_paths_to_user(unresolved))
+    store.flush()
+
+    plan = []
+    remaining = []
+    for entry in entries:
+        relative_path = store.get(entry['file_type'])
+        if relative_path is None:
+            remaining.append(entry)
+            continue
+        move = get_relative_move(
+            entry['file'], entry['folder'], relative_path, fcc.REASON_USER_CONFIG)
+        if move is not None:
+            plan.append(move)
+
+    plan, collisions = folder_cleaner.find_plan_collisions(
+        plan, collision_policy)
+    folder_cleaner.execute_plan(plan, workers)
+    # Colliding files stay in the queue too
+    collided = {move.source for move in collisions}
+    remaining.extend(entry for entry in entries if entry['file'] in collided)
+    write_queue(queue_file, remaining)
+    return plan
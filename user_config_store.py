@@ -0,0 +1,119 @@
+"""
+A Module to read & update the user config (file type => relative path) through a single in-memory store
+
+The file is loaded once and the lookups are served from a lower-cased dictionary.  The updates are coalesced in memory
+and persisted with a single write (see utils.update_json, which writes to a temporary file & renames it over the
+config), so a concurrent reader (E.g. the watcher or a worker process) never reads a partially written file.
+"""
+
+from os.path import exists
+
+import utils
+
+
+class UserConfigStore():
+    """
+        User config (file type => relative path), loaded once, with batched atomic writes
+    """
+
+    def __init__(self, user_config_file):
+        """
+        Parameters:
+        ---
+        user_config_file: str
+            Path of the user_config JSON file (read as empty, if not exists)
+        """
+        self.user_config_file = user_config_file
+        self.__config = None
+        # file type (lower case) => relative path
+        self.__paths = None
+        # Updates which are not written yet (file type => relative path)
+        self.__pending = {}
+
+    def __load(self):
+        """
+        Loads the user config from the file, once
+        """
+        if self.__config is None:
+            self.__config = utils.load_json(self.user_config_file) if exists(
+                self.user_config_file) else {}
+            self.__paths = {file_type.lower(): path for file_type,
+                            path in self.__config.items()}
+
+    def to_dict(self):
+        """
+        Returns the user config (file type => relative path), along with the updates which are not written yet
+        """
+        self.__load()
+        return dict(self.__config)
+
+    @property
+    def paths(self):
+        """
+        Returns the user config by the lower-cased file types (file type => relative path)
+        """
+        self.__load()
+        return self.__paths
+
+    def get(self, file_type, default=None):
+        """
+        Returns the relative path configured for a file type (case-insensitive), default if not configured
+
+        Parameters:
+        ---
+        file_type: str
+            File type to search for (E.g. 'py')
+        default: any
+            Value to return if the file type is not configured (default None)
+        """
+        return self.paths.get(file_type.lower(), default)
+
+    def set(self, file_type, path):
+        """
+        Sets the relative path of a file type (written by flush)
+
+        Parameters:
+        ---
+        file_type: str
+            File type to configure (E.g. 'py')
+        path: str
+            Relative path of the folder to move the files of the file type into (or PARENT)
+        """
+        self.update({file_type: path})
+
+    def update(self, path_info: dict):
+        """
+        Sets the relative paths of many file types (written by flush)
+
+        Parameters:
+        ---
+        path_info: dict
+            file type => relative path
+        """
+        self.__load()
+        self.__pending.update(path_info)
+        self.__config.update(path_info)
+        self.__paths.update((file_type.lower(), path)
+                            for file_type, path in path_info.items())
+
+    def flush(self):
+        """
+        Writes the pending updates with a single atomic write (does nothing if there is no update) and Returns True if written.
+        The file is read again just before, so that the changes made by others since the load are kept
+        """
+        if not self.__pending:
+            return False
+        on_disk = utils.load_json(self.user_config_file) if exists(
+            self.user_config_file) else {}
+        self.__config = utils.merge_dictionaries(on_disk, self.__pending)
+        self.__paths = {file_type.lower(): path for file_type,
+                        path in self.__config.items()}
+        utils.update_json(self.user_config_file, self.__config)
+        self.__pending = {}
+        return True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
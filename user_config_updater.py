@@ -2,8 +2,9 @@
 A Module to update the user configuration file to set a custom path for any file-type
 """
 
-from folder_cleaner import get_file_paths
+from folder_cleaner import build_file_type_index, get_indexed_file_paths
 import user_config_constants as ucc
+from user_config_store import UserConfigStore
 import utils
 
 
@@ -33,16 +34,15 @@ if __name__ == '__main__':
     user_config_fp = 'userFileTypesConfig.json'
     default_config_fp = 'fileTypesConfig.json'
 
-    user_config = utils.load_json(user_config_fp)
+    user_config = UserConfigStore(user_config_fp)
     default_config = utils.load_json(default_config_fp)
 
     user_path = user_config.get(ext, ucc.NOT_AVAILABLE)
 
-    default_paths = []
-    get_file_paths(default_config, ext, default_paths)
+    default_paths = get_indexed_file_paths(
+        build_file_type_index(default_config), ext)
 
     if len(default_paths) > 0:
-        default_paths = utils.reverse_nested_list(default_paths)
         available_paths = {str(i): '\\'.join(default_path)
                            for i, default_path in enumerate(default_paths)}
         print_paths(available_paths, user_path)
@@ -59,15 +59,15 @@ if __name__ == '__main__':
             else:
                 new_path = available_paths.get(ip)
                 if not new_path is None:
-                    user_config[ext] = new_path
-                    utils.update_json(user_config_fp, user_config)
+                    user_config.set(ext, new_path)
+                    user_config.flush()
                     print(f"Path Updated for the type {ext}")
                     print(f"\tUpdated Path '{new_path}'")
         elif choice == 'n':
             new_path = input('Enter a Relative Path(s): ').strip()
             if new_path != '':
-                user_config[ext] = new_path
-                utils.update_json(user_config_fp, user_config)
+                user_config.set(ext, new_path)
+                user_config.flush()
                 print(f"Path Updated for the type {ext}")
                 print(f"\tUpdated Path '{new_path}'")
         else:
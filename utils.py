@@ -8,10 +8,9 @@ import json
 
 from os.path import exists
 from pathlib import Path
-from time import time
-from multiprocessing import Process
+from time import perf_counter
 
-import spinner
+from progress_reporter import ProgressReporter
 
 
 def get_files(directory, files_only=False):
@@ -110,6 +109,8 @@ def update_json(json_path, json_data: dict, indentation=4):
     """
     Update a JSON File with a new updated JSON Data
 
+    The data is written into a temporary file, which then replaces the JSON File, so a reader never sees a partial file
+
     Parameters:
     ---
     json_path: str
@@ -119,8 +120,11 @@ def update_json(json_path, json_data: dict, indentation=4):
     indentation: number
         Indentation for a JSON File (default 4)
     """
-    with open(json_path, 'w') as json_file:
+    temp_path = os.path.join(os.path.dirname(json_path),
+                             f".{os.path.basename(json_path)}.{os.getpid()}.tmp")
+    with open(temp_path, 'w') as json_file:
         json.dump(json_data, json_file, indent=indentation)
+    os.replace(temp_path, json_path)
 
 
 def create_file(file_path, data=''):
@@ -143,39 +147,42 @@ def reverse_nested_list(ll):
     return [l[::-1] for l in ll if isinstance(l, list)]
 
 
-def start_spinner(flag: bool, delay=.5, msg='PROCESSING'):
+def start_spinner(flag: bool, delay=.5, msg='PROCESSING', total=None, get_done=None):
     """
-    Uses spinner package to display spinner parallely and Returns the instance of a running spinner.
+    Uses a ProgressReporter (background thread) to display spinner parallely and Returns the instance of a running reporter.
 
-    Spin only if flag is True, else return None
+    Spin only if flag is True, else return None.  Nothing is displayed when the stdout is not a terminal
 
     Parameters:
     ---
     flag: bool
         Flag that conditionally displays spinner.  Spinner will get displayed only if it is set to True
     delay: number
-        No of seconds the cursor should remain in one direction        
+        Minimum no of seconds between two updates of the spinner
     msg: str
         Message that should get logged along with the spinner
+    total: int
+        Total number of files of the phase, to display the ETA (default None => unknown)
+    get_done: callable
+        Function that Returns the number of files processed so far, to display the progress (default None)
     """
     if flag:
-        spnr = spinner.start_spinner(msg=msg)
-        return spnr
+        return ProgressReporter(msg, total, get_done, delay).start()
 
 
-def stop_spinner(spnr: Process, msg="done"):
+def stop_spinner(spnr: ProgressReporter, msg="done"):
     """
-    Terminates the spinner process
+    Stops the spinner
 
     Parameters:
     ---
-    spnr: Process
-        Instance of the running spinner process
+    spnr: ProgressReporter
+        Instance of the running reporter
     msg: str
         Stop Message
     """
-    if isinstance(spnr, Process):
-        spinner.stop_spinner(spnr, msg)
+    if isinstance(spnr, ProgressReporter):
+        spnr.stop(msg)
 
 
 def performance(func):
@@ -183,9 +190,9 @@ def performance(func):
     Decorator Method to know the no of seconds your method took to execute    
     """
     def wrap_func(*args, **kwargs):
-        t1 = time()
+        t1 = perf_counter()
         res = func(*args, **kwargs)
-        t2 = time()
-        print('took {t2 - t1} sec')
+        t2 = perf_counter()
+        print(f'{func.__name__} took {t2 - t1:.6f} sec')
         return res
     return wrap_func